@@ -0,0 +1,170 @@
+"""
+Synthetic datasets shaped like the lemongrab datasets built from mobygames.
+
+Every game is released on a number of platforms, every release has a number of
+release countries and production roles. The companies of the production roles are
+drawn from a long tail distribution: a few companies work on many games, most
+companies only on a few, like publishers and small studios in the real data.
+"""
+
+import random
+
+from itertools import accumulate
+from lemongrab.settings import (
+    ID_2_SLUG_FILENAME,
+    MOBYGAMES_COMPANIES_FILENAME,
+    WIKIDATA_MAPPING_FILENAME,
+)
+from lemongrab.utils import write_json
+from pathlib import Path
+
+PLATFORMS = [
+    "DOS",
+    "Windows",
+    "Macintosh",
+    "Linux",
+    "Sony PlayStation",
+    "PlayStation 2",
+    "PlayStation 4",
+    "Nintendo 64",
+    "SNES",
+    "NES",
+    "Game Boy",
+    "Game Boy Advance",
+    "Nintendo DS",
+    "Wii",
+    "Xbox",
+    "Xbox 360",
+    "Sega Genesis",
+    "Amiga",
+    "Commodore 64",
+    "Atari 2600",
+]
+
+COUNTRIES = [
+    "Worldwide",
+    "United States",
+    "Japan",
+    "United Kingdom",
+    "Germany",
+    "France",
+    "Italy",
+    "Spain",
+    "Sweden",
+    "Netherlands",
+    "Australia",
+    "Canada",
+    "Brazil",
+    "South Korea",
+    "China",
+    "Poland",
+    "Russia",
+    "Finland",
+    "Denmark",
+    "Norway",
+]
+
+ROLES = [
+    "Developed by",
+    "Published by",
+    "Ported by",
+    "Licensed by",
+    "Distributed by",
+    "Co-Published by",
+    "Additional Work by",
+]
+
+
+def synthetic_datasets(
+    n_companies=1000,
+    n_games=5000,
+    releases_per_game=2,
+    roles_per_release=3,
+    countries_per_release=2,
+    seed=0,
+):
+    """
+    Returns a synthetic mobygames companies dataset, id to slug mapping and wikidata
+    mapping, like utils.get_datasets. Two out of three companies have a wikidata
+    country.
+    """
+    rnd = random.Random(seed)
+    companies = [str(i) for i in range(n_companies)]
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(n_companies)))
+    releases_per_game = min(releases_per_game, len(PLATFORMS))
+    countries_per_release = min(countries_per_release, len(COUNTRIES))
+
+    mobygames_companies = {}
+    for game in range(n_games):
+        first_year = rnd.randrange(1980, 2020)
+        years = list(range(first_year, first_year + rnd.randrange(1, 4)))
+        for platform in rnd.sample(PLATFORMS, releases_per_game):
+            countries = rnd.sample(COUNTRIES, countries_per_release)
+            for company_id in rnd.choices(
+                companies, cum_weights=cum_weights, k=roles_per_release
+            ):
+                if company_id not in mobygames_companies:
+                    mobygames_companies[company_id] = []
+                mobygames_companies[company_id].append(
+                    {
+                        "company_name": f"Company {company_id}",
+                        "game_id": str(game),
+                        "game_slug": f"game-{game}",
+                        "game_title": f"Game {game}",
+                        "game_years": years,
+                        "production_role": rnd.choice(ROLES),
+                        "release_countries": countries,
+                        "platform": platform,
+                    }
+                )
+
+    id_2_slug = [
+        {"company_id": company_id, "slug": f"company-{company_id}"}
+        for company_id in companies
+    ]
+    wikidata_mapping = [
+        {
+            "mobygames_slug": f"company-{company_id}",
+            "country": rnd.choice(COUNTRIES[1:]) if i % 3 else None,
+            "wkp": f"Q{i}",
+        }
+        for i, company_id in enumerate(companies)
+    ]
+    return mobygames_companies, id_2_slug, wikidata_mapping
+
+
+def synthetic_sample(mobygames_companies, n_games, seed=0):
+    """
+    Returns a tulpa game company sample of :n_games: random games of the companies
+    dataset: game slug -> list of company entries.
+    """
+    sample = {}
+    for company_id, infos in mobygames_companies.items():
+        for info in infos:
+            sample.setdefault(info["game_slug"], []).append(
+                {
+                    "company_id": int(company_id),
+                    "company_name": info["company_name"],
+                    "role": info["production_role"],
+                    "release_countries": info["release_countries"],
+                    "platform": info["platform"],
+                    "game_slug": info["game_slug"],
+                }
+            )
+    rnd = random.Random(seed)
+    games = rnd.sample(sorted(sample), min(n_games, len(sample)))
+    return {game: sample[game] for game in games}
+
+
+def write_datasets(datasets, datasets_dir):
+    """
+    Writes the datasets of synthetic_datasets into the files read by lemongrab.
+    """
+    filenames = [
+        MOBYGAMES_COMPANIES_FILENAME,
+        ID_2_SLUG_FILENAME,
+        WIKIDATA_MAPPING_FILENAME,
+    ]
+    Path(datasets_dir).mkdir(parents=True, exist_ok=True)
+    for filename, data in zip(filenames, datasets):
+        write_json(data, Path(datasets_dir) / filename)
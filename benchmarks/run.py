@@ -0,0 +1,274 @@
+"""
+Benchmark suite of lemongrab.
+
+Every benchmark runs on synthetic datasets (see datagen.py) of several sizes in a
+temporary lemongrab project. The best wall time of several runs and the peak memory
+allocated by Python during a separate run (measured with tracemalloc) are reported.
+
+$ python -m benchmarks.run --size small --size medium --output bench.json
+
+With --baseline, the results are compared to the results file of an earlier run and
+the command fails if a benchmark got slower or needs more memory than the given
+tolerances allow. In CI, create the baseline on the same runner, e.g. from the main
+branch, and check the changes against it.
+"""
+
+import click
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from .datagen import synthetic_datasets, synthetic_sample, write_datasets
+from lemongrab.combined_dataset import get_combined_dataset
+from lemongrab.company_network import CompanyNetworkBuilder
+from lemongrab.export import export_network
+from lemongrab.sample_company_network import SampleCompanyNetwork
+from lemongrab.settings import COMPANY_NETWORKS_DIR, DATASETS_DIR
+from pathlib import Path
+
+# size name -> parameters of synthetic_datasets
+SIZES = {
+    "tiny": {"n_companies": 50, "n_games": 200},
+    "small": {"n_companies": 500, "n_games": 5000},
+    "medium": {"n_companies": 2000, "n_games": 20000},
+    "large": {"n_companies": 5000, "n_games": 80000},
+}
+
+SAMPLE_GAMES = 0.1
+GAMELIST_GAMES = 0.1
+
+# differences below these values are never reported as regressions
+TIME_RESOLUTION = 0.01
+MEMORY_RESOLUTION = 2**16
+
+
+def measure(func, repeat=3):
+    """
+    Returns the best wall time of :repeat: calls of :func: and the peak memory in
+    bytes allocated during one further call.
+    """
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(seconds), peak
+
+
+def benchmarks(datasets):
+    """
+    Returns a list of (name, function) tuples of all benchmarks. Must be called in a
+    project directory containing the written :datasets:.
+    """
+    mobygames_companies = datasets[0]
+    game_slugs = sorted(
+        {info["game_slug"] for infos in mobygames_companies.values() for info in infos}
+    )
+    gamelist = game_slugs[: max(1, int(len(game_slugs) * GAMELIST_GAMES))]
+    sample = synthetic_sample(
+        mobygames_companies, max(1, int(len(game_slugs) * SAMPLE_GAMES))
+    )
+
+    # create the snapshot for the snapshot benchmark and keep a loaded dataset
+    dataset = get_combined_dataset()
+    release_platform = dataset.platforms[0]
+    countries = dataset.countries[:2]
+    network = CompanyNetworkBuilder(
+        platform=release_platform, countries=(), dataset=dataset
+    ).build_network()[0]
+    basename = Path(COMPANY_NETWORKS_DIR) / "benchmark"
+
+    def export(format, compress=False):
+        return lambda: export_network(
+            network.nodes(), network.edges(), basename, format, compress
+        )
+
+    def get_overview():
+        dataset.set_filter([], [])
+        dataset.get_overview()
+
+    return [
+        ("get_combined_dataset", lambda: get_combined_dataset(snapshot=False)),
+        ("get_combined_dataset (snapshot)", lambda: get_combined_dataset()),
+        ("set_filter", lambda: dataset.set_filter([release_platform], countries)),
+        ("set_filter (all)", lambda: dataset.set_filter([], [])),
+        ("set_gamelist_filter", lambda: dataset.set_gamelist_filter(gamelist)),
+        ("get_overview", get_overview),
+        (
+            "CompanyNetworkBuilder.build",
+            lambda: CompanyNetworkBuilder(
+                platform=release_platform, countries=(), dataset=dataset
+            ).build(),
+        ),
+        (
+            "CompanyNetworkBuilder.build (roles)",
+            lambda: CompanyNetworkBuilder(
+                platform=release_platform,
+                countries=(),
+                roles=True,
+                publisher=True,
+                dataset=dataset,
+            ).build(),
+        ),
+        (
+            "SampleCompanyNetwork.build_network",
+            lambda: SampleCompanyNetwork(sample, dataset).build_network(),
+        ),
+        ("graphml export", export("graphml")),
+        ("graphml export (gzip)", export("graphml", True)),
+        ("gexf export", export("gexf")),
+        ("csv export", export("csv")),
+    ]
+
+
+def run_size(size, params, repeat=3, selected=None):
+    """
+    Runs all (or the :selected:) benchmarks on a synthetic dataset of :size: and
+    returns a list of result dictionaries.
+    """
+    datasets = synthetic_datasets(**params)
+    n_records = sum(len(infos) for infos in datasets[0].values())
+
+    results = []
+    old_cwd = Path.cwd()
+    with tempfile.TemporaryDirectory() as project_dir:
+        os.chdir(project_dir)
+        try:
+            write_datasets(datasets, DATASETS_DIR)
+            Path(COMPANY_NETWORKS_DIR).mkdir()
+            for name, func in benchmarks(datasets):
+                if selected and name not in selected:
+                    continue
+                seconds, peak = measure(func, repeat)
+                results.append(
+                    {
+                        "size": size,
+                        "records": n_records,
+                        "benchmark": name,
+                        "seconds": seconds,
+                        "peak_memory": peak,
+                    }
+                )
+                print_result(results[-1])
+        finally:
+            os.chdir(old_cwd)
+    return results
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """
+    Returns a list of all regressions of :results: compared to the :baseline:
+    results. Benchmarks missing in the baseline are skipped.
+    """
+    baseline = {(r["size"], r["benchmark"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        base = baseline.get((result["size"], result["benchmark"]))
+        if base is None:
+            continue
+        label = f"{result['benchmark']} [{result['size']}]"
+        max_seconds = base["seconds"] * (1 + time_tolerance) + TIME_RESOLUTION
+        max_memory = base["peak_memory"] * (1 + memory_tolerance) + MEMORY_RESOLUTION
+        if result["seconds"] > max_seconds:
+            regressions.append(
+                f"{label}: {result['seconds']:.3f}s, baseline {base['seconds']:.3f}s"
+            )
+        if result["peak_memory"] > max_memory:
+            regressions.append(
+                f"{label}: {result['peak_memory'] / 2**20:.1f} MiB, "
+                f"baseline {base['peak_memory'] / 2**20:.1f} MiB"
+            )
+    return regressions
+
+
+def print_result(result):
+    click.echo(
+        f"{result['size']:<8} {result['benchmark']:<40} "
+        f"{result['seconds']:>9.3f}s {result['peak_memory'] / 2**20:>9.1f} MiB",
+        err=True,
+    )
+
+
+@click.command()
+@click.option(
+    "--size",
+    "-s",
+    "sizes",
+    type=click.Choice(list(SIZES)),
+    multiple=True,
+    help="Dataset size (default: small)",
+)
+@click.option(
+    "--benchmark", "-b", "selected", multiple=True, help="Only run this benchmark"
+)
+@click.option("--roles-per-release", type=int, default=3, show_default=True)
+@click.option("--countries-per-release", type=int, default=2, show_default=True)
+@click.option("--repeat", "-r", type=int, default=3, show_default=True)
+@click.option("--output", "-o", type=click.Path(), help="Write the results as JSON")
+@click.option(
+    "--baseline", type=click.Path(exists=True), help="Compare with earlier results"
+)
+@click.option("--time-tolerance", type=float, default=0.25, show_default=True)
+@click.option("--memory-tolerance", type=float, default=0.1, show_default=True)
+def main(
+    sizes,
+    selected,
+    roles_per_release,
+    countries_per_release,
+    repeat,
+    output,
+    baseline,
+    time_tolerance,
+    memory_tolerance,
+):
+    """
+    Runs the lemongrab benchmarks.
+    """
+    results = []
+    for size in sizes or ["small"]:
+        params = dict(
+            SIZES[size],
+            roles_per_release=roles_per_release,
+            countries_per_release=countries_per_release,
+        )
+        results += run_size(size, params, repeat, selected)
+
+    if output:
+        with open(output, "w") as outfile:
+            json.dump(
+                {
+                    "python": sys.version,
+                    "platform": platform.platform(),
+                    "results": results,
+                },
+                outfile,
+                indent=4,
+            )
+
+    if baseline:
+        with open(baseline) as infile:
+            regressions = compare(
+                results, json.load(infile)["results"], time_tolerance, memory_tolerance
+            )
+        for regression in regressions:
+            click.echo(f"Regression: {regression}", err=True)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Pruning of the edges of company networks.
+
+Full-platform networks have far more edges than Gephi can handle. The edges are
+therefore pruned right after they are counted, before the edge tables are built:
+
+* min_weight: edges with fewer shared games are dropped
+* disparity filter (Serrano, Boguna, Vespignani 2009, "Extracting the multiscale
+  backbone of complex weighted networks"): an edge is kept if its weight is a
+  significant part of the strength of one of its nodes. For a node with strength s
+  (sum of its weights) and degree k, the edge of weight w has the significance
+  alpha = (1 - w / s) ** (k - 1). Edges with alpha below the threshold for at least
+  one node with k > 1 are kept.
+"""
+
+from array import array
+
+
+def node_strengths(weights, n_nodes):
+    """
+    Returns the strength (sum of the edge weights) and the degree of all nodes of
+    a (node_1, node_2) -> weight dictionary.
+    """
+    strengths = array("Q", bytes(8 * n_nodes))
+    degrees = array("I", bytes(4 * n_nodes))
+    for (node_1, node_2), weight in weights.items():
+        strengths[node_1] += weight
+        strengths[node_2] += weight
+        degrees[node_1] += 1
+        degrees[node_2] += 1
+    return strengths, degrees
+
+
+def significant(weight, strength, degree, alpha):
+    """
+    True if an edge of :weight: is significant at level :alpha: for a node of
+    :strength: and :degree:.
+    """
+    if degree <= 1:
+        return False
+    return (1 - weight / strength) ** (degree - 1) < alpha
+
+
+def prune_weights(weights, n_nodes, min_weight=1, alpha=None):
+    """
+    Returns the edges of the (node_1, node_2) -> weight dictionary :weights: with
+    at least :min_weight: shared games, which belong to the disparity backbone at
+    level :alpha: (if given). The backbone is extracted from the edges with at
+    least :min_weight:.
+    """
+    if min_weight > 1:
+        weights = {edge: w for edge, w in weights.items() if w >= min_weight}
+    if alpha is None:
+        return weights
+
+    strengths, degrees = node_strengths(weights, n_nodes)
+    return {
+        (node_1, node_2): weight
+        for (node_1, node_2), weight in weights.items()
+        if significant(weight, strengths[node_1], degrees[node_1], alpha)
+        or significant(weight, strengths[node_2], degrees[node_2], alpha)
+    }
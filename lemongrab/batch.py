@@ -0,0 +1,180 @@
+"""
+Batch generation of company networks from a spec file.
+
+The spec lists one network per job, either as YAML list (optionally under a "jobs"
+key) or as CSV file with a header:
+
+- countries: [Japan, Worldwide]
+  platform: Sony PlayStation
+  roles: true
+- platform: DOS
+  publisher: true
+  roles: true
+- gamelist: ../tulpaproject/gamelist.yml
+
+countries,platform,roles,publisher,gamelist
+Japan;Worldwide,Sony PlayStation,true,,
+,DOS,true,true,
+
+The dataset is loaded (and indexed) once for all jobs. Jobs with the same filters
+(countries and platform, or gamelist) are run one after another on the same
+filtered dataset, so every filter is only applied once. With several workers, the
+groups of jobs are distributed across processes.
+"""
+
+import csv
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from .combined_dataset import get_combined_dataset
+from .company_network import CompanyNetworkBuilder
+from pathlib import Path
+from .utils import read_yaml
+
+JOB_FIELDS = ["countries", "platform", "roles", "publisher", "gamelist"]
+
+TRUE_VALUES = {"true", "yes", "1", "x"}
+FALSE_VALUES = {"false", "no", "0", ""}
+
+# dataset of the worker processes, see _init_worker
+_dataset = None
+
+
+def _to_bool(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid boolean value in batch spec: {value}")
+
+
+def normalize_job(job):
+    """
+    Returns the job dictionary of a spec entry: countries is a tuple, roles and
+    publisher are booleans, platform and gamelist are strings or None.
+    """
+    unknown = set(job) - set(JOB_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields in batch spec: {', '.join(sorted(unknown))}")
+
+    countries = job.get("countries") or ()
+    if isinstance(countries, str):
+        countries = [c.strip() for c in countries.split(";") if c.strip()]
+    return {
+        "countries": tuple(countries),
+        "platform": job.get("platform") or None,
+        "roles": _to_bool(job.get("roles")),
+        "publisher": _to_bool(job.get("publisher")),
+        "gamelist": job.get("gamelist") or None,
+    }
+
+
+def read_batch_spec(filename):
+    """
+    Reads the jobs of a YAML or CSV batch spec.
+    """
+    if Path(filename).suffix == ".csv":
+        with open(filename, newline="") as f:
+            jobs = list(csv.DictReader(f))
+    else:
+        jobs = read_yaml(filename) or []
+        if isinstance(jobs, dict):
+            jobs = jobs.get("jobs") or []
+    return [normalize_job(job) for job in jobs]
+
+
+def filter_key(job):
+    """
+    Returns the filters of a job, jobs with the same key share the filtered dataset.
+    """
+    if job["gamelist"]:
+        return ("gamelist", job["gamelist"])
+    return ("filter", job["platform"], tuple(sorted(job["countries"])))
+
+
+def group_jobs(jobs):
+    """
+    Returns lists of (job number, job) tuples of the jobs with the same filters.
+    """
+    groups = {}
+    for i, job in enumerate(jobs):
+        groups.setdefault(filter_key(job), []).append((i, job))
+    return list(groups.values())
+
+
+def run_group(dataset, group, profile=False, format="graphml", compress=False):
+    """
+    Builds the networks of a group of jobs with the same filters. The dataset is
+    filtered for the first job only. Returns a list of (job number, build result)
+    tuples.
+    """
+    results = []
+    for n, (i, job) in enumerate(group):
+        builder = CompanyNetworkBuilder(
+            job["gamelist"],
+            job["countries"],
+            job["platform"],
+            job["roles"],
+            job["publisher"],
+            dataset=dataset,
+            profile=profile,
+            format=format,
+            compress=compress,
+        )
+        results.append((i, builder.build(apply_filter=n == 0)))
+    return results
+
+
+def _init_worker(dataset):
+    global _dataset
+    _dataset = dataset
+
+
+def _run_worker_group(group, profile, format, compress):
+    return run_group(_dataset, group, profile, format, compress)
+
+
+def run_batch(
+    jobs, dataset=None, workers=1, profile=False, format="graphml", compress=False
+):
+    """
+    Builds the networks of all :jobs: and returns their build results
+    (out_file, nodes, edges, games) in the order of the jobs.
+
+    With :workers: > 1 the groups of jobs are run in that many processes. Where
+    available, the processes are forked, so they share the loaded dataset with
+    the main process instead of receiving a copy.
+    """
+    if dataset is None:
+        dataset = get_combined_dataset()
+
+    groups = group_jobs(jobs)
+    results = [None] * len(jobs)
+    if workers <= 1 or len(groups) <= 1:
+        for group in groups:
+            for i, result in run_group(dataset, group, profile, format, compress):
+                results[i] = result
+        return results
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(groups)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(dataset,),
+    ) as executor:
+        futures = [
+            executor.submit(_run_worker_group, group, profile, format, compress)
+            for group in groups
+        ]
+        for future in futures:
+            for i, result in future.result():
+                results[i] = result
+    return results
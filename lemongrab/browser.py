@@ -1,22 +1,196 @@
 """
 Simple browser application for exploring the game companies dataset
+
+Filtering does not change the dataset, so requests can be served concurrently.
+With several workers, the dataset is loaded once and the worker processes are
+forked from the loading process: they share the dataset (copy-on-write) and
+accept the requests of the same listening socket.
+
+The workers run werkzeug's threaded server, which is meant for a local browser
+rather than for a public deployment. The interactive debugger is only enabled
+in dev mode (lemongrab browser --dev).
 """
+import csv
+import gc
+import io
+import json
+import multiprocessing
+import signal
 import sys
+import threading
 import time
 import webbrowser
 
+from functools import lru_cache
 from multiprocessing import Process
 from flask_cors import CORS
-from flask import Flask, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
+from operator import itemgetter
+from werkzeug.serving import make_server
 from .combined_dataset import get_combined_dataset
-from .settings import BROWSER_DEBUG, BROWSER_PORT
-from .utils import load_gamelist
+from .settings import BROWSER_CACHE_SIZE, BROWSER_DEBUG, BROWSER_PORT, BROWSER_WORKERS
+from .utils import datasets_signature, load_gamelist
 
 app = Flask(__name__)
 cors = CORS(app)
 app.config["CORS_HEADERS"] = "Content-Type"
 
-dataset = get_combined_dataset()
+# the dataset is loaded on first use, see get_dataset
+dataset = None
+dataset_signature = None
+dataset_lock = threading.Lock()
+
+GAMES_COLUMNS = ["game_title", "company_name", "production_role", "company_country"]
+COMPANIES_COLUMNS = ["company_name", "no_of_games"]
+# number of rows written into each chunk of the streamed CSV export
+CSV_CHUNK_ROWS = 1000
+
+
+@lru_cache(maxsize=BROWSER_CACHE_SIZE)
+def filtered_overview(dataset, platforms, countries, gamelist):
+    """
+    Returns the overview of :dataset: filtered by platforms and countries,
+    or by the games in :gamelist:, if given. The results of the last
+    BROWSER_CACHE_SIZE filters are cached. The dataset is part of the cache
+    key, so the overviews of a replaced dataset are never reused.
+    """
+    if gamelist is None:
+        filtered_dataset = dataset.filter(platforms, countries)
+    else:
+        filtered_dataset = dataset.gamelist_filter(gamelist)
+    data = dataset.get_overview(filtered_dataset)
+
+    # flat rows for the server-side processed tables
+    data["games_rows"] = []
+    for slug, entries in data["games_table"].items():
+        for entry in entries:
+            entry["game_slug"] = slug
+            data["games_rows"].append(entry)
+    data["companies_rows"] = [
+        {"company_name": name, "no_of_games": n}
+        for name, n in data["companies"].most_common()
+    ]
+    return data
+
+
+def get_dataset():
+    """
+    Returns the combined dataset. It is loaded on first use and reloaded (and the
+    overview cache is cleared) when the dataset files have changed. Concurrent
+    requests wait for the reload instead of loading the dataset again.
+    """
+    global dataset, dataset_signature
+
+    with dataset_lock:
+        signature = datasets_signature()
+        if dataset is None or signature != dataset_signature:
+            if dataset is not None:
+                print("datasets changed, reloading")
+            dataset = get_combined_dataset()
+            dataset_signature = signature
+            filtered_overview.cache_clear()
+        return dataset
+
+
+def get_overview(platforms, countries, gamelist_file):
+    """
+    Normalizes the filter parameters and returns the (cached) overview.
+    """
+    dataset = get_dataset()
+
+    if gamelist_file:
+        gamelist = tuple(sorted(set(load_gamelist(gamelist_file))))
+        return filtered_overview(dataset, (), (), gamelist)
+    return filtered_overview(
+        dataset, tuple(sorted(set(platforms))), tuple(sorted(set(countries))), None
+    )
+
+
+def request_filter(values):
+    """
+    Returns the platforms, countries and gamelist file of a request. The table
+    requests send the filter of the analysis page as JSON in the "filter" parameter.
+    """
+    if "filter" in values:
+        values = json.loads(values["filter"])
+        return (
+            values.get("platform_dropdown", []),
+            values.get("country_dropdown", []),
+            values.get("gamelist_file", ""),
+        )
+    return (
+        values.getlist("platform_dropdown"),
+        values.getlist("country_dropdown"),
+        values.get("gamelist_file", ""),
+    )
+
+
+def datatables_page(rows, columns, values):
+    """
+    Answers a DataTables server-side processing request: returns the rows matching
+    the search value, sorted by the requested column and sliced to the requested
+    page.
+    """
+    n_total = len(rows)
+
+    search = values.get("search[value]", "").lower()
+    if search:
+        rows = [
+            row for row in rows if any(search in str(row[c]).lower() for c in columns)
+        ]
+
+    if "order[0][column]" in values:
+        column = columns[values.get("order[0][column]", 0, type=int) % len(columns)]
+        reverse = values.get("order[0][dir]") == "desc"
+        rows = sorted(rows, key=itemgetter(column), reverse=reverse)
+
+    start = values.get("start", 0, type=int)
+    length = values.get("length", 10, type=int)
+    end = len(rows) if length < 0 else start + length
+
+    return {
+        "draw": values.get("draw", 0, type=int),
+        "recordsTotal": n_total,
+        "recordsFiltered": len(rows),
+        "data": rows[start:end],
+    }
+
+
+@app.route("/api/games", methods=["GET", "POST"])
+def api_games():
+    data = get_overview(*request_filter(request.values))
+    return jsonify(datatables_page(data["games_rows"], GAMES_COLUMNS, request.values))
+
+
+@app.route("/api/companies", methods=["GET", "POST"])
+def api_companies():
+    data = get_overview(*request_filter(request.values))
+    return jsonify(
+        datatables_page(data["companies_rows"], COMPANIES_COLUMNS, request.values)
+    )
+
+
+@app.route("/api/games.csv", methods=["GET", "POST"])
+def api_games_csv():
+    data = get_overview(*request_filter(request.values))
+
+    def csv_chunks():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(GAMES_COLUMNS)
+        for i, row in enumerate(data["games_rows"], 1):
+            writer.writerow([row[c] for c in GAMES_COLUMNS])
+            if i % CSV_CHUNK_ROWS == 0:
+                yield out.getvalue()
+                out.seek(0)
+                out.truncate()
+        yield out.getvalue()
+
+    return Response(
+        csv_chunks(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=games.csv"},
+    )
 
 
 @app.route("/analysis", methods=["POST"])
@@ -26,18 +200,7 @@ def analysis():
     countries = request.form.getlist("country_dropdown")
     platforms = request.form.getlist("platform_dropdown")
 
-    if not gamelist_file:
-
-        print("set filter->")
-        dataset.set_filter(platforms, countries)
-        print("get overview data")
-
-    else:
-        gamelist = load_gamelist(gamelist_file)
-        dataset.set_gamelist_filter(gamelist)
-        print("gamelist file")
-
-    data = dataset.get_overview()
+    data = get_overview(platforms, countries, gamelist_file)
 
     try:
         companies_ratio = data["companies_with_country"] / len(data["companies"])
@@ -48,6 +211,7 @@ def analysis():
         "analysis.html",
         platforms=platforms,
         countries=countries,
+        gamelist_file=gamelist_file,
         companies_n=len(data["companies"]),
         most_common=data["companies_most_common"],
         company_games=data["company_games"],
@@ -55,20 +219,60 @@ def analysis():
         companies_with_country=data["companies_with_country"],
         companies_country_ratio=companies_ratio,
         production_roles=data["production_roles"],
-        games_table=data["games_table"],
     )
 
 
 @app.route("/")
 def index():
+    dataset = get_dataset()
     return render_template(
         "index.html", platforms=dataset.platforms, countries=dataset.countries
     )
 
 
-def start_backend():
+def serve_workers(workers, port=BROWSER_PORT):
+    """
+    Serves the app with :workers: forked processes (each of them threaded), which
+    share the listening socket and the loaded dataset.
+    """
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("Forking is not available, serving with a single worker.")
+        server.serve_forever()
+        return
+
+    # keep the garbage collector from touching (and copying) the shared objects
+    gc.freeze()
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=server.serve_forever, daemon=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    server.socket.close()
+    # stop the workers when the backend is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+def start_backend(workers=BROWSER_WORKERS, dev=BROWSER_DEBUG):
+    """
+    Serves the app with :workers: processes. In :dev: mode, the app is served by a
+    single process with the interactive debugger.
+    """
     try:
-        app.run(debug=BROWSER_DEBUG, port=BROWSER_PORT, use_reloader=False)
+        if dev:
+            app.run(debug=True, port=BROWSER_PORT, use_reloader=False)
+        elif workers > 1:
+            serve_workers(workers)
+        else:
+            app.run(debug=False, port=BROWSER_PORT, use_reloader=False)
     except OSError as e:
         print("Cannot start provis server.")
         sys.exit(e)
@@ -79,7 +283,9 @@ def start_webbrowser():
     webbrowser.open("http://localhost:{}".format(BROWSER_PORT))
 
 
-def start_browser():
-    backend_process = Process(target=start_backend)
+def start_browser(workers=BROWSER_WORKERS, dev=BROWSER_DEBUG):
+    # load the dataset before the backend process is forked
+    get_dataset()
+    backend_process = Process(target=start_backend, args=(workers, dev))
     backend_process.start()
     start_webbrowser()
@@ -1,28 +1,29 @@
 #!/usr/bin/env python3
+"""
+Command line interface of lemongrab.
+
+The modules of the commands (and their dependencies like flask, networkx or
+SPARQLWrapper) are imported inside the commands, so starting the cli stays fast.
+"""
 import click
 import json
 import sys
 
-from .wikidata import build_wikidata_mapping
-from .company_dataset import build_mobygames_companies
-from .company_network import build_company_network
 from pathlib import Path
-from .sample_company_network import SampleCompanyNetwork
 from .settings import (
+    BROWSER_DEBUG,
+    BROWSER_WORKERS,
+    BUILD_WORKERS,
     DIGGR_API,
+    DIGGR_API_CACHE_TTL,
     DATASETS_DIR,
+    SPARQL_ENDPOINT,
+    SPARQL_PAGE_SIZE,
     COMPANY_NETWORKS_DIR,
     ID_2_SLUG_FILENAME,
     ID_2_SLUG_PATH,
 )
 from shutil import copyfile
-from .utils import build_aggregated_logs
-
-company_dataset_present = True
-try:
-    from lemongrab.browser import start_browser
-except FileNotFoundError:
-    company_dataset_present = False
 
 
 @click.group()
@@ -55,17 +56,43 @@ def build():
 
 
 @build.command()
-def wikidata_mapping():
+@click.option(
+    "--sparql-endpoint",
+    default=SPARQL_ENDPOINT,
+    help="URL of the Wikidata (or any other) SPARQL endpoint",
+)
+@click.option(
+    "--page-size",
+    default=SPARQL_PAGE_SIZE,
+    type=click.IntRange(min=0),
+    help="Number of results per query, 0 fetches all results at once",
+)
+@click.option(
+    "--diff",
+    is_flag=True,
+    help="Only apply the changes to the existing mapping and report them",
+)
+def wikidata_mapping(sparql_endpoint, page_size, diff):
     """
     Fetch new Wikidata company dataset
     """
+    from .wikidata import build_wikidata_mapping
+
     print("Building wikidata mapping ...")
 
     try:
-        n_entries, mapping_filename = build_wikidata_mapping()
+        n_entries, mapping_filename, changes = build_wikidata_mapping(
+            sparql_endpoint, page_size, diff
+        )
     except RuntimeError as e:
         sys.exit(e)
 
+    if changes is not None:
+        added, removed = changes
+        for sign, entries in [("-", removed), ("+", added)]:
+            for entry in entries:
+                print(f"{sign} {entry['mobygames_slug']}: {entry['country']}")
+        print(f"{len(added)} entries added, {len(removed)} entries removed.")
     print(f"Mapped {n_entries} wikidata items with Mobygames Company ID.")
     print(f"Mapping file saved as: {mapping_filename}")
 
@@ -74,21 +101,104 @@ def wikidata_mapping():
 @click.option(
     "--unified-api-url", default=DIGGR_API, help="URL of any UnifiedAPI instance"
 )
-def mobygames_companies(unified_api_url):
+@click.option(
+    "--workers",
+    "-w",
+    default=BUILD_WORKERS,
+    type=click.IntRange(min=1),
+    help="Number of parallel requests to the UnifiedAPI",
+)
+@click.option(
+    "--refresh-changed",
+    is_flag=True,
+    help="Only fetch games which are new since the last build, drop games which are gone",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "jsonl"]),
+    default="json",
+    help="Write the dataset as JSON or as streamed JSON Lines",
+)
+@click.option(
+    "--cache",
+    is_flag=True,
+    help="Keep the UnifiedAPI responses in a local cache for faster rebuilds",
+)
+@click.option(
+    "--cache-ttl",
+    default=DIGGR_API_CACHE_TTL,
+    type=click.IntRange(min=0),
+    help="Seconds a cached response is used before it is revalidated",
+)
+def mobygames_companies(
+    unified_api_url, workers, refresh_changed, output_format, cache, cache_ttl
+):
     """
     Build new company dataset from the Mobygames dataset
     """
+    from .company_dataset import build_mobygames_companies
+
     print("Building company dataset...")
-    mobygames_companies_filename = build_mobygames_companies(unified_api_url)
+    mobygames_companies_filename = build_mobygames_companies(
+        unified_api_url, workers, refresh_changed, output_format, cache, cache_ttl
+    )
     print(f"Mobygames companies file saved as: {mobygames_companies_filename}")
 
 
+@build.command()
+def columnar_companies():
+    """
+    Convert the company dataset into the compact columnar format
+    """
+    from .company_dataset import build_columnar_companies
+
+    print("Converting company dataset...")
+    try:
+        columnar_filename = build_columnar_companies()
+    except FileNotFoundError as e:
+        sys.exit(e)
+    print(f"Columnar companies file saved as: {columnar_filename}")
+
+
 @build.command()
 @click.option(
     "--unified-api-url", default=DIGGR_API, help="URL of any UnifiedAPI instance"
 )
+@click.option(
+    "--workers",
+    "-w",
+    default=BUILD_WORKERS,
+    type=click.IntRange(min=1),
+    help="Number of parallel requests to the UnifiedAPI",
+)
+@click.option(
+    "--refresh-changed",
+    is_flag=True,
+    help="Only fetch games which are new since the last build, drop games which are gone",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "jsonl"]),
+    default="json",
+    help="Write the dataset as JSON or as streamed JSON Lines",
+)
+@click.option(
+    "--cache",
+    is_flag=True,
+    help="Keep the UnifiedAPI responses in a local cache for faster rebuilds",
+)
+@click.option(
+    "--cache-ttl",
+    default=DIGGR_API_CACHE_TTL,
+    type=click.IntRange(min=0),
+    help="Seconds a cached response is used before it is revalidated",
+)
 @click.pass_context
-def all(ctx, unified_api_url):
+def all(
+    ctx, unified_api_url, workers, refresh_changed, output_format, cache, cache_ttl
+):
     """
     Build both, the Wikidata mapping and the company dataset.
     """
@@ -96,14 +206,30 @@ def all(ctx, unified_api_url):
     ctx.forward(mobygames_companies)
 
 
-if company_dataset_present:
+@cli.command()
+@click.option(
+    "--workers",
+    "-w",
+    default=BROWSER_WORKERS,
+    type=click.IntRange(min=1),
+    help="Number of processes serving requests, sharing one loaded dataset",
+)
+@click.option(
+    "--dev",
+    is_flag=True,
+    default=BROWSER_DEBUG,
+    help="Serve with a single process and the interactive debugger",
+)
+def browser(workers, dev):
+    """
+    Start data exploration and visualization browser
+    """
+    from .browser import start_browser
 
-    @cli.command()
-    def browser():
-        """
-        Start data exploration and visualization browser
-        """
-        start_browser()
+    try:
+        start_browser(workers, dev)
+    except FileNotFoundError as e:
+        sys.exit(e)
 
 
 @cli.command()
@@ -121,13 +247,91 @@ if company_dataset_present:
     "--roles/--no-roles", default=False, help="Include/Exclude roles of a company"
 )
 @click.option("--publisher/--no-publisher", default=False)
-def company_network(gamelist, country, platform, roles, publisher):
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of processes used to build the network",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Write wall time and peak memory of the build stages into the log",
+)
+@click.option(
+    "--format",
+    "-f",
+    "export_format",
+    default="graphml",
+    type=click.Choice(["graphml", "gexf", "csv", "parquet"]),
+    help="Output format of the network (default: graphml)",
+)
+@click.option("--gzip", "compress", is_flag=True, help="Compress the output files")
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Keep a state file and only recount the edges of changed companies",
+)
+@click.option(
+    "--min-weight",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Drop edges with fewer shared games",
+)
+@click.option(
+    "--top-companies",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Only include the N companies with the most games",
+)
+@click.option(
+    "--backbone",
+    default=None,
+    type=click.FloatRange(min=0, max=1),
+    metavar="ALPHA",
+    help="Only keep the disparity backbone at significance level ALPHA (e.g. 0.05)",
+)
+def company_network(
+    gamelist,
+    country,
+    platform,
+    roles,
+    publisher,
+    jobs,
+    profile,
+    export_format,
+    compress,
+    incremental,
+    min_weight,
+    top_companies,
+    backbone,
+):
     """
     Build company network for Gephi import
     """
+    from .company_network import build_company_network
+    from .export import check_format
+
+    try:
+        check_format(export_format)
+    except RuntimeError as e:
+        sys.exit(e)
     print("Building company network...")
     out_file, n_nodes, n_edges, n_games = build_company_network(
-        gamelist, country, platform, roles, publisher
+        gamelist,
+        country,
+        platform,
+        roles,
+        publisher,
+        jobs,
+        profile,
+        export_format,
+        compress,
+        incremental,
+        min_weight,
+        top_companies,
+        backbone,
     )
     print(f"Network file saved as: {out_file}")
     print(f"Nodes in network: {n_nodes}")
@@ -137,16 +341,107 @@ def company_network(gamelist, country, platform, roles, publisher):
 
 @cli.command()
 @click.option("--out", default="company_networks/game_company_network_sample.graphml")
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Write wall time and peak memory of the build stages into the log",
+)
+@click.option(
+    "--format",
+    "-f",
+    "export_format",
+    default="graphml",
+    type=click.Choice(["graphml", "gexf", "csv", "parquet"]),
+    help="Output format of the network (default: graphml)",
+)
+@click.option("--gzip", "compress", is_flag=True, help="Compress the output files")
 @click.argument("game_company_sample", type=click.File())
-def game_company_sample_network(out, game_company_sample):
+def game_company_sample_network(
+    out, profile, export_format, compress, game_company_sample
+):
     """
     Builds a company network from a sample.
     """
+    from .export import check_format
+    from .sample_company_network import SampleCompanyNetwork
+
+    try:
+        check_format(export_format)
+    except RuntimeError as e:
+        sys.exit(e)
     out_folder = Path(out).resolve().parent
     if not out_folder.is_dir():
         out_folder.mkdir(parents=True)
-    scn = SampleCompanyNetwork(json.load(game_company_sample))
-    scn.build_network().save_network(out)
+    scn = SampleCompanyNetwork(json.load(game_company_sample), profile=profile)
+    scn.build_network().save_network(out, export_format, compress)
+
+
+@cli.command()
+@click.option(
+    "--workers",
+    "-w",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of processes building networks in parallel",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Write wall time and peak memory of the build stages into the logs",
+)
+@click.option(
+    "--format",
+    "-f",
+    "export_format",
+    default="graphml",
+    type=click.Choice(["graphml", "gexf", "csv", "parquet"]),
+    help="Output format of the networks (default: graphml)",
+)
+@click.option("--gzip", "compress", is_flag=True, help="Compress the output files")
+@click.argument("spec", type=click.Path(exists=True))
+def batch(workers, profile, export_format, compress, spec):
+    """
+    Build all company networks of a YAML or CSV spec file.
+    """
+    from .batch import read_batch_spec, run_batch
+    from .export import check_format
+
+    try:
+        check_format(export_format)
+        jobs = read_batch_spec(spec)
+    except (RuntimeError, ValueError) as e:
+        sys.exit(e)
+
+    print(f"Building {len(jobs)} company networks...")
+    results = run_batch(jobs, None, workers, profile, export_format, compress)
+    for out_file, n_nodes, n_edges, n_games in results:
+        print(f"{out_file}: {n_nodes} nodes, {n_edges} edges, {n_games} games")
+
+
+@cli.command()
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of processes used to build each network",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Write wall time and peak memory of the build stages into the logs",
+)
+def rebuild(jobs, profile):
+    """
+    Incrementally rebuild all company networks of the project after a dataset
+    refresh, using the parameters of their logs.
+    """
+    from .company_network import rebuild_company_networks
+
+    print("Rebuilding company networks...")
+    results = rebuild_company_networks(jobs, profile)
+    for out_file, n_nodes, n_edges, n_games in results:
+        print(f"{out_file}: {n_nodes} nodes, {n_edges} edges, {n_games} games")
 
 
 @cli.command()
@@ -155,6 +450,8 @@ def aggregate_logs(out):
     """
     Aggregates all logs of the current project into a CSV file.
     """
+    from .utils import build_aggregated_logs
+
     outfilename, used_logs = build_aggregated_logs(out)
     print(f"Aggregates logs saved as: {outfilename}")
     print(f"Used log files:")
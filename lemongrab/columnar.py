@@ -0,0 +1,227 @@
+"""
+Compact columnar representation of the mobygames companies dataset.
+
+The production roles of the dataset are normalized into a game, a release, a company
+and a production role table. Repeated strings (platforms, countries, roles and
+company names) are stored once in dictionaries, the tables only contain integer
+codes. All columns are saved as typed arrays into a single uncompressed zip file:
+
+meta.json       version, byte order, typecodes and string dictionaries
+<column>.bin    raw bytes of an array column
+"""
+
+import json
+import sys
+import zipfile
+
+from array import array
+
+COLUMNAR_VERSION = 1
+
+# column name -> array typecode
+COLUMNS = {
+    # game table, the years of game i are game_years[offsets[i]:offsets[i + 1]]
+    "game_years_offsets": "I",
+    "game_years": "H",
+    # release table
+    "release_game": "I",
+    "release_platform": "H",
+    "release_countries_offsets": "I",
+    "release_countries": "H",
+    # production role table
+    "role_company": "I",
+    "role_release": "I",
+    "role_company_name": "I",
+    "role_production_role": "H",
+}
+
+# string dictionaries and per-row string columns
+STRINGS = [
+    "company_ids",
+    "company_names",
+    "game_ids",
+    "game_slugs",
+    "game_titles",
+    "platforms",
+    "countries",
+    "production_roles",
+]
+
+
+class StringCodes:
+    """
+    Assigns consecutive integer codes to strings (or any other hashable value),
+    starting with the codes of the optional list of :values:.
+    """
+
+    def __init__(self, values=None):
+        self.values = list(values) if values else []
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def __call__(self, value):
+        try:
+            return self.codes[value]
+        except KeyError:
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+            return self.codes[value]
+
+
+class ColumnarDataset:
+    """
+    Normalized, columnar version of the mobygames companies dataset.
+
+    Build it from a company dataset or load it from a file:
+    columnar = ColumnarDataset.from_mobygames_companies(mobygames_companies)
+    columnar.save(filename)
+    mobygames_companies = ColumnarDataset.load(filename).to_mobygames_companies()
+
+    The production role table keeps the order of the company dataset, so
+    to_mobygames_companies returns the dataset the columnar version was built from.
+    """
+
+    def __init__(self, columns, strings):
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+        for name in STRINGS:
+            setattr(self, name, strings[name])
+
+    @classmethod
+    def from_mobygames_companies(cls, mobygames_companies):
+        columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        columns["game_years_offsets"].append(0)
+        columns["release_countries_offsets"].append(0)
+
+        company_ids = StringCodes()
+        company_names = StringCodes()
+        games = StringCodes()
+        releases = StringCodes()
+        platforms = StringCodes()
+        countries = StringCodes()
+        production_roles = StringCodes()
+        game_slugs = []
+        game_titles = []
+
+        for company_id, production_infos in mobygames_companies.items():
+            company = company_ids(company_id)
+            for info in production_infos:
+                n_games = len(games.values)
+                game = games(info["game_id"])
+                if game == n_games:
+                    game_slugs.append(info["game_slug"])
+                    game_titles.append(info["game_title"])
+                    columns["game_years"].extend(info["game_years"])
+                    columns["game_years_offsets"].append(len(columns["game_years"]))
+
+                platform = platforms(info["platform"])
+                release_countries = tuple(info["release_countries"])
+                n_releases = len(releases.values)
+                release = releases((game, platform, release_countries))
+                if release == n_releases:
+                    columns["release_game"].append(game)
+                    columns["release_platform"].append(platform)
+                    columns["release_countries"].extend(
+                        countries(country) for country in release_countries
+                    )
+                    columns["release_countries_offsets"].append(
+                        len(columns["release_countries"])
+                    )
+
+                columns["role_company"].append(company)
+                columns["role_release"].append(release)
+                columns["role_company_name"].append(company_names(info["company_name"]))
+                columns["role_production_role"].append(
+                    production_roles(info["production_role"])
+                )
+
+        strings = {
+            "company_ids": company_ids.values,
+            "company_names": company_names.values,
+            "game_ids": games.values,
+            "game_slugs": game_slugs,
+            "game_titles": game_titles,
+            "platforms": platforms.values,
+            "countries": countries.values,
+            "production_roles": production_roles.values,
+        }
+        return cls(columns, strings)
+
+    def to_mobygames_companies(self):
+        """
+        Returns the dataset as dictionary company_id -> production information list.
+        Strings, years and release country lists are shared between all records of
+        a game or release.
+        """
+        games = []
+        offsets = self.game_years_offsets
+        for i, (game_id, slug, title) in enumerate(
+            zip(self.game_ids, self.game_slugs, self.game_titles)
+        ):
+            start, end = offsets[i], offsets[i + 1]
+            games.append((game_id, slug, title, self.game_years[start:end].tolist()))
+
+        releases = []
+        offsets = self.release_countries_offsets
+        for i, (game, platform) in enumerate(
+            zip(self.release_game, self.release_platform)
+        ):
+            start, end = offsets[i], offsets[i + 1]
+            countries = [
+                self.countries[country] for country in self.release_countries[start:end]
+            ]
+            releases.append((games[game], self.platforms[platform], countries))
+
+        mobygames_companies = {}
+        for company, release, company_name, production_role in zip(
+            self.role_company,
+            self.role_release,
+            self.role_company_name,
+            self.role_production_role,
+        ):
+            (game_id, slug, title, years), platform, countries = releases[release]
+            company_id = self.company_ids[company]
+            if company_id not in mobygames_companies:
+                mobygames_companies[company_id] = []
+            mobygames_companies[company_id].append(
+                {
+                    "company_name": self.company_names[company_name],
+                    "game_id": game_id,
+                    "game_slug": slug,
+                    "game_title": title,
+                    "game_years": years,
+                    "production_role": self.production_roles[production_role],
+                    "release_countries": countries,
+                    "platform": platform,
+                }
+            )
+        return mobygames_companies
+
+    def save(self, outfilename):
+        meta = {
+            "version": COLUMNAR_VERSION,
+            "byteorder": sys.byteorder,
+            "columns": COLUMNS,
+            "strings": {name: getattr(self, name) for name in STRINGS},
+        }
+        with zipfile.ZipFile(outfilename, "w", zipfile.ZIP_STORED) as zf:
+            zf.writestr("meta.json", json.dumps(meta))
+            for name in COLUMNS:
+                zf.writestr(f"{name}.bin", getattr(self, name).tobytes())
+        return outfilename
+
+    @classmethod
+    def load(cls, infilename):
+        with zipfile.ZipFile(infilename) as zf:
+            meta = json.loads(zf.read("meta.json"))
+            if meta["version"] != COLUMNAR_VERSION:
+                raise ValueError(
+                    f"Unsupported columnar dataset version {meta['version']}"
+                )
+            columns = {}
+            for name, typecode in meta["columns"].items():
+                column = array(typecode)
+                column.frombytes(zf.read(f"{name}.bin"))
+                if meta["byteorder"] != sys.byteorder:
+                    column.byteswap()
+                columns[name] = column
+        return cls(columns, meta["strings"])
@@ -1,5 +1,15 @@
+import os
+import pickle
+
+from array import array
 from collections import Counter, defaultdict
-from .utils import get_datasets
+from pathlib import Path
+from .records import RecordDataset, compact_dataset
+from .settings import COMBINED_DATASET_SNAPSHOT_FILENAME, DATASETS_DIR
+from .utils import datasets_signature, get_datasets
+
+# increase whenever the attributes of CombinedDataset change, to invalidate old snapshots
+SNAPSHOT_VERSION = 3
 
 
 class CombinedDataset:
@@ -8,12 +18,27 @@ class CombinedDataset:
 
     Use the factory get_combined_dataset to inistanciate!
     dataset = get_combined_dataset()
-    dataset.set_filter(platforms, countries)
-    overview = dataset.get_overview()
+    filtered_dataset = dataset.filter(platforms, countries)
+    overview = dataset.get_overview(filtered_dataset)
+
+    The base dataset holds compact Records (see records.py) instead of the
+    production information dictionaries of the dataset files.
+
+    filter, gamelist_filter and get_overview do not change the dataset, so it can
+    be shared by concurrent requests. set_filter and set_gamelist_filter store
+    the filtered dataset in the filtered_dataset attribute instead, which is used
+    by get_overview if no filtered dataset is passed.
     """
 
     def __init__(self, mobygames_companies, id_2_slug, wikidata_mapping):
+        if not isinstance(mobygames_companies, RecordDataset):
+            mobygames_companies = compact_dataset(
+                (company_id, info)
+                for company_id, infos in mobygames_companies.items()
+                for info in infos
+            )
         self.base_dataset = mobygames_companies
+        self.vocabulary = mobygames_companies.vocabulary
         self.slug_map = {x["company_id"]: x["slug"] for x in id_2_slug}
         self.country_map = {
             x["mobygames_slug"]: x["country"] for x in wikidata_mapping if x["country"]
@@ -29,52 +54,46 @@ class CombinedDataset:
     def get_production_role_data(self, production_role):
         pass
 
-    def get_overview(self):
+    def get_overview(self, filtered_dataset=None):
+        """
+        Aggregates the :filtered_dataset: (default: the filtered_dataset attribute)
+        in a single pass over its records. Company names and countries are looked
+        up in the per-company maps of setup_data.
+        """
+        if filtered_dataset is None:
+            filtered_dataset = self.filtered_dataset
+        role_names = self.vocabulary.production_roles.values
         production_roles = Counter()
         companies = Counter()
-        companies_games = defaultdict(set)
+        companies_games = {}
         companies_with_country = 0
-        countries_accumulated = Counter()
+        countries_acc = defaultdict(set)
         games_dataset = defaultdict(list)
 
-        for company_id, games in self.filtered_dataset.items():
+        for company_id, games in filtered_dataset.items():
 
-            company_country = ""
-            company_slug = self.slug_map[company_id]
-            if company_slug in self.country_map:
-                company_country = self.country_map[company_slug]
+            company_name = self.company_names[company_id]
+            company_country = self.company_countries[company_id]
 
+            game_slugs = set()
             for game in games:
-                companies_games[company_id].update([game["game_slug"]])
-                production_roles.update([game["production_role"]])
-
-                games_dataset[game["game_slug"]].append(
+                release_game = game.release.game
+                game_slugs.add(release_game.slug)
+                games_dataset[release_game.slug].append(
                     {
-                        "game_title": game["game_title"],
-                        "company_name": game["company_name"],
+                        "game_title": release_game.title,
+                        "company_name": game.company_name,
                         "company_country": company_country,
-                        "production_role": game["production_role"],
+                        "production_role": role_names[game.role_code],
                     }
                 )
+            production_roles.update(role_names[game.role_code] for game in games)
 
-        companies = Counter(
-            {
-                self.base_dataset[x][0]["company_name"]: len(y)
-                for x, y in companies_games.items()
-            }
-        )
-        companies_games = companies_games
-
-        countries_acc = defaultdict(set)
-        companies_with_country = 0
-        for company_id in companies_games.keys():
-            if company_id in self.slug_map:
-                slug = self.slug_map[company_id]
-                if slug in self.country_map:
-                    companies_with_country += 1
-                    countries_acc[self.country_map[slug]].add(
-                        self.base_dataset[company_id][0]["company_name"]
-                    )
+            companies_games[company_id] = game_slugs
+            companies[company_name] = len(game_slugs)
+            if company_country:
+                companies_with_country += 1
+                countries_acc[company_country].add(company_name)
 
         countries_accumulated = Counter({x: len(y) for x, y in countries_acc.items()})
 
@@ -88,58 +107,188 @@ class CombinedDataset:
             "games_table": dict(games_dataset),
         }
 
+    def gamelist_filter(self, gamelist):
+        """
+        Returns the production roles of the games in :gamelist: grouped by company.
+        """
+        return self._group(self._lookup(self.game_index, set(gamelist)))
+
     def set_gamelist_filter(self, gamelist):
-        self.filtered_dataset = {}
+        self.filtered_dataset = self.gamelist_filter(gamelist)
 
-        for company_id, games in self.base_dataset.items():
-            filtered_games = []
-            for game in games:
-                if game["game_slug"] in gamelist:
-                    filtered_games.append(game)
+    def filter(self, platforms, countries):
+        """
+        Returns the production roles with any of the release platforms and release
+        countries grouped by company. An empty list of platforms or countries
+        matches every production role.
+
+        Only the positions of the smaller of both index lookups are gathered, the
+        other filter is checked against the codes of these records directly.
+        """
+        platforms = set(platforms)
+        countries = set(countries)
+        if not platforms and not countries:
+            return self._group(range(len(self.records)))
+
+        n_platform = sum(len(self.platform_index.get(p, ())) for p in platforms)
+        n_country = sum(len(self.country_index.get(c, ())) for c in countries)
 
-            if len(filtered_games) > 0:
-                self.filtered_dataset[company_id] = filtered_games
+        if platforms and (not countries or n_platform <= n_country):
+            positions = self._lookup(self.platform_index, platforms)
+            if countries:
+                codes = self._codes(self.vocabulary.countries, countries)
+                positions = [
+                    pos
+                    for pos in positions
+                    if not codes.isdisjoint(self.records[pos].release.country_codes)
+                ]
+        else:
+            positions = self._lookup(self.country_index, countries)
+            if platforms:
+                codes = self._codes(self.vocabulary.platforms, platforms)
+                positions = [
+                    pos
+                    for pos in positions
+                    if self.records[pos].release.platform_code in codes
+                ]
+
+        return self._group(positions)
 
     def set_filter(self, platforms, countries):
-        self.filtered_dataset = {}
-        countries = set(countries)
-        for company_id, games in self.base_dataset.items():
+        """
+        Filters the dataset like filter and keeps the result in filtered_dataset.
+        """
+        self.filtered_dataset = self.filter(platforms, countries)
 
-            filtered_games = []
-            for game in games:
-                add = False
-                if game["platform"] in platforms or len(platforms) == 0:
-                    # companies.update([ game["company_name"] ])
-                    if len(countries) > 0:
-                        if len(countries.intersection(game["release_countries"])) > 0:
-                            add = True
-                    else:
-                        add = True
-
-                if add:
-                    filtered_games.append(game)
-            if len(filtered_games) > 0:
-                self.filtered_dataset[company_id] = filtered_games
+    @staticmethod
+    def _codes(string_codes, values):
+        """
+        Returns the set of vocabulary codes of :values:, unknown values are skipped.
+        """
+        return {string_codes.codes[v] for v in values if v in string_codes.codes}
+
+    def _lookup(self, index, keys):
+        """
+        Returns the sorted positions of all records listed in :index: for any of
+        the :keys:.
+        """
+        if len(keys) == 1:
+            return index.get(next(iter(keys)), ())
+        positions = set()
+        for key in keys:
+            positions.update(index.get(key, ()))
+        return sorted(positions)
+
+    def _group(self, positions):
+        """
+        Groups the records at :positions: by company id. With sorted positions,
+        the companies and their production roles keep their order of the base
+        dataset.
+        """
+        filtered_dataset = {}
+        for pos in positions:
+            record = self.records[pos]
+            company_id = record.company_id
+            if company_id not in filtered_dataset:
+                filtered_dataset[company_id] = []
+            filtered_dataset[company_id].append(record)
+        return filtered_dataset
 
     def setup_data(self):
-        self.platforms = set()
-        self.countries = set()
-        self.roles = set()
+        """
+        Builds the flat record list and the inverted indexes used for filtering.
+        Each index maps a platform, release country, production role or game slug
+        to the positions of its records in self.records.
+        """
+        self.records = []
+        self.platform_index = defaultdict(lambda: array("I"))
+        self.country_index = defaultdict(lambda: array("I"))
+        self.role_index = defaultdict(lambda: array("I"))
+        self.game_index = defaultdict(lambda: array("I"))
+
+        platforms = self.vocabulary.platforms.values
+        countries = self.vocabulary.countries.values
+        roles = self.vocabulary.production_roles.values
         for games in self.base_dataset.values():
             for game in games:
-                if game["platform"]:
-                    self.platforms.add(game["platform"])
-                self.countries.update(
-                    [country for country in game["release_countries"] if country]
-                )
+                pos = len(self.records)
+                self.records.append(game)
+                release = game.release
+                self.platform_index[platforms[release.platform_code]].append(pos)
+                for country in set(release.country_codes):
+                    self.country_index[countries[country]].append(pos)
+                self.role_index[roles[game.role_code]].append(pos)
+                self.game_index[release.game.slug].append(pos)
+
+        self.platform_index = dict(self.platform_index)
+        self.country_index = dict(self.country_index)
+        self.role_index = dict(self.role_index)
+        self.game_index = dict(self.game_index)
+
+        # name (of the first record) and wikidata country of every company
+        self.company_names = {}
+        self.company_countries = {}
+        for company_id, games in self.base_dataset.items():
+            self.company_names[company_id] = games[0].company_name
+            slug = self.slug_map.get(company_id)
+            self.company_countries[company_id] = self.country_map.get(slug, "")
+
+        self.platforms = sorted(p for p in self.platform_index if p)
+        self.countries = sorted(c for c in self.country_index if c)
+        self.roles = sorted(r for r in self.role_index if r)
+
 
-        self.platforms = sorted(list(self.platforms))
-        self.countries = sorted(list(self.countries))
+def load_snapshot(snapshot_filename, signature):
+    """
+    Returns the CombinedDataset stored in the snapshot file, or None if there is
+    no snapshot for the current snapshot version and dataset files :signature:.
+    """
+    try:
+        with open(snapshot_filename, "rb") as f:
+            version, snapshot_signature, dataset = pickle.load(f)
+    except Exception:
+        return None
+    if version != SNAPSHOT_VERSION or snapshot_signature != signature:
+        return None
+    return dataset
 
 
-def get_combined_dataset():
+def save_snapshot(dataset, snapshot_filename, signature):
+    """
+    Saves the fully set up CombinedDataset together with the :signature: of the
+    dataset files it was built from.
+    """
+    tmp_filename = Path(f"{snapshot_filename}.tmp")
+    try:
+        with open(tmp_filename, "wb") as f:
+            pickle.dump(
+                (SNAPSHOT_VERSION, signature, dataset), f, pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmp_filename, snapshot_filename)
+    except OSError:
+        print("Could not save combined dataset snapshot.")
+        if tmp_filename.exists():
+            tmp_filename.unlink()
+
+
+def get_combined_dataset(snapshot=True):
     """
     Factory which returns an instance of CombinedDataset.
+
+    The fully set up dataset (including maps, platform/country lists and indexes)
+    is cached in a snapshot file in DATASETS_DIR. As long as the dataset files are
+    unchanged, later calls load the snapshot instead of building the dataset again.
     """
+    snapshot_filename = Path(DATASETS_DIR) / COMBINED_DATASET_SNAPSHOT_FILENAME
+    if snapshot:
+        signature = datasets_signature()
+        dataset = load_snapshot(snapshot_filename, signature)
+        if dataset is not None:
+            return dataset
+
     mobygames_companies, id_2_slug, wikidata_mapping = get_datasets()
-    return CombinedDataset(mobygames_companies, id_2_slug, wikidata_mapping)
+    dataset = CombinedDataset(mobygames_companies, id_2_slug, wikidata_mapping)
+
+    if snapshot:
+        save_snapshot(dataset, snapshot_filename, signature)
+    return dataset
@@ -2,21 +2,183 @@ import diggrtoolbox as dt
 import json
 
 from collections import defaultdict
-from .diggr_api import DiggrApi
+from .columnar import ColumnarDataset
+from itertools import groupby
+from operator import itemgetter
+from .diggr_api import DiggrApi, fetch_entries
+from .http_cache import ResponseCache
 from pathlib import Path
 from provit import Provenance
 from .settings import (
+    BUILD_WORKERS,
+    COLUMNAR_PROV_ACTIVITY,
+    COLUMNAR_PROV_DESC,
     DATASETS_DIR,
     DIGGR_API,
+    DIGGR_API_CACHE_FILENAME,
+    DIGGR_API_CACHE_SIZE,
+    DIGGR_API_CACHE_TTL,
+    MOBYGAMES_COMPANIES_COLUMNAR_FILENAME,
     MOBYGAMES_COMPANIES_FILENAME,
+    MOBYGAMES_COMPANIES_JOURNAL_FILENAME,
+    MOBYGAMES_COMPANIES_JSONL_FILENAME,
+    MOBYGAMES_COMPANIES_PROCESSED_FILENAME,
     COMPANIES_PROV_ACTIVITY,
     COMPANIES_PROV_DESC,
     PROV_AGENT,
 )
 from tqdm import tqdm
+from .utils import (
+    mobygames_companies_path,
+    read_json,
+    read_jsonl,
+    read_mobygames_companies,
+    write_json,
+)
+
+
+class BuildJournal:
+    """
+    On-disk journal of the games processed by a companies dataset build.
+
+    Every line is a JSON object with the game id and the company rows extracted from
+    the game entry:
+
+    {"game_id": <game_id>, "companies": [[<company_id>, <prod_info>], ...]}
+
+    Each line is flushed as soon as the game is processed, so an interrupted build
+    can be resumed from the journal.
+    """
+
+    def __init__(self, filename):
+        self.filename = Path(filename)
+        self.file = None
+
+    def exists(self):
+        return self.filename.exists()
+
+    def entries(self):
+        """
+        Yields the journaled games as (game_id, company rows) tuples.
+        A trailing line left incomplete by an interrupted build is cut off.
+        """
+        if not self.exists():
+            return
+
+        valid_size = 0
+        with open(self.filename, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_size += len(line)
+                yield entry["game_id"], entry["companies"]
+
+        if valid_size < self.filename.stat().st_size:
+            with open(self.filename, "r+b") as f:
+                f.truncate(valid_size)
+
+    def seed(self, games, ids, processed_ids=()):
+        """
+        Journals the (game_id, company rows) tuples of an existing companies dataset
+        which are still listed in :ids:, so only new games have to be fetched.
+        Games of the previous build without any company rows are not part of the
+        dataset, they are journaled from its :processed_ids:.
+        """
+        ids = set(ids)
+        seeded = set()
+        with self:
+            for game_id, rows in games:
+                if game_id in ids:
+                    self.append(game_id, rows)
+                    seeded.add(game_id)
+            for game_id in processed_ids:
+                if game_id in ids and game_id not in seeded:
+                    self.append(game_id, [])
+
+    def append(self, game_id, rows):
+        self.file.write(json.dumps({"game_id": game_id, "companies": rows}) + "\n")
+        self.file.flush()
+
+    def remove(self):
+        self.filename.unlink()
+
+    def __enter__(self):
+        self.file = open(self.filename, "a")
+        return self
+
+    def __exit__(self, *args):
+        self.file.close()
+        self.file = None
+
+
+def company_rows(id_, data, pm):
+    """
+    Yields a (company_id, production information) tuple for every company listed in
+    the releases of the mobygames game entry :data:. The company ids are strings,
+    like the keys of the JSON dataset and the ids of the id to slug mapping.
+    """
+    slug = data["raw"]["moby_url"].split("/")[-1]
+
+    for platform in data["raw"]["platforms"]:
+        for release in platform["releases"]:
+            for company in release["companies"]:
+                yield str(company["company_id"]), {
+                    "company_name": company["company_name"],
+                    "game_id": id_,
+                    "game_slug": slug,
+                    "game_title": data["title"],
+                    "game_years": data["years"],
+                    "production_role": company["role"],
+                    "release_countries": release["countries"],
+                    "platform": pm[platform["platform_name"]],
+                }
+
+
+def dataset_games(mg_companies_filename):
+    """
+    Yields the games of an existing companies dataset file (JSON, JSON Lines or
+    columnar) as (game_id, company rows) tuples.
+    """
+    if Path(mg_companies_filename).suffix == ".jsonl":
+        records = read_jsonl(mg_companies_filename)
+        for game_id, game_records in groupby(records, key=itemgetter("game_id")):
+            yield game_id, [[str(r.pop("company_id")), r] for r in game_records]
+    else:
+        games = defaultdict(list)
+        mobygames_companies = read_mobygames_companies(mg_companies_filename)
+        for company_id, production_infos in mobygames_companies.items():
+            for production_info in production_infos:
+                games[production_info["game_id"]].append([company_id, production_info])
+        yield from games.items()
 
 
-def build_mobygames_companies(unified_api_url=DIGGR_API):
+def write_jsonl_dataset(games, ids, outfilename):
+    """
+    Writes the company rows of all (game_id, company rows) tuples in :games: with
+    a game id in :ids: as JSON Lines, one production information per line.
+    """
+    with open(outfilename, "w") as outfile:
+        for game_id, rows in games:
+            if game_id not in ids:
+                continue
+            for company_id, production_info in rows:
+                record = {"company_id": str(company_id), **production_info}
+                outfile.write(json.dumps(record) + "\n")
+    return outfilename
+
+
+def build_mobygames_companies(
+    unified_api_url=DIGGR_API,
+    workers=BUILD_WORKERS,
+    refresh_changed=False,
+    output_format="json",
+    cache=False,
+    cache_ttl=DIGGR_API_CACHE_TTL,
+):
     """
     Builds a reduced local company dataset from the unified api mobygames dataset.
 
@@ -39,35 +201,91 @@ def build_mobygames_companies(unified_api_url=DIGGR_API):
     * game_years
     * release_countries
     * platform
+
+    The game entries are fetched by :workers: parallel requests and aggregated in
+    the order of the mobygames ids, so the result does not depend on :workers:.
+
+    Processed games are recorded in a BuildJournal, an interrupted build picks up
+    where it stopped when it is run again. With :refresh_changed: the games of the
+    existing dataset are reused and only games which are new in the UnifiedAPI are
+    fetched, games which are gone are dropped. The ids of all processed games
+    (including games without companies) are kept next to the dataset for that.
+
+    With :output_format: "jsonl" the dataset is written as JSON Lines instead, one
+    production information (with an additional company_id) per line. The rows are
+    streamed from the journal, so they are never held in memory all at once.
+
+    With :cache: the UnifiedAPI responses are kept in a ResponseCache in
+    DATASETS_DIR. They are reused for :cache_ttl: seconds and revalidated after
+    that, so rebuilds against an unchanged UnifiedAPI are mostly local reads.
     """
-    api = DiggrApi(unified_api_url)
+    response_cache = None
+    if cache:
+        response_cache = ResponseCache(
+            Path(DATASETS_DIR) / DIGGR_API_CACHE_FILENAME,
+            cache_ttl,
+            DIGGR_API_CACHE_SIZE,
+        )
+    api = DiggrApi(unified_api_url, response_cache)
     pm = dt.PlatformMapper("mobygames")
 
-    dataset = defaultdict(list)
-
-    for id_ in tqdm(api.mobygames_ids()):
-        data = api.entry("mobygames", id_)
-        slug = data["raw"]["moby_url"].split("/")[-1]
-
-        for platform in data["raw"]["platforms"]:
-            for release in platform["releases"]:
-                for company in release["companies"]:
-                    dataset[company["company_id"]].append(
-                        {
-                            "company_name": company["company_name"],
-                            "game_id": id_,
-                            "game_slug": slug,
-                            "game_title": data["title"],
-                            "game_years": data["years"],
-                            "production_role": company["role"],
-                            "release_countries": release["countries"],
-                            "platform": pm[platform["platform_name"]],
-                        }
-                    )
-
-    mg_companies_filename = Path(DATASETS_DIR) / MOBYGAMES_COMPANIES_FILENAME
-    with open(mg_companies_filename, "w") as f:
-        json.dump(dict(dataset), f, indent=4)
+    if output_format == "jsonl":
+        mg_companies_filename = Path(DATASETS_DIR) / MOBYGAMES_COMPANIES_JSONL_FILENAME
+    else:
+        mg_companies_filename = Path(DATASETS_DIR) / MOBYGAMES_COMPANIES_FILENAME
+    journal = BuildJournal(Path(DATASETS_DIR) / MOBYGAMES_COMPANIES_JOURNAL_FILENAME)
+    processed_filename = Path(DATASETS_DIR) / MOBYGAMES_COMPANIES_PROCESSED_FILENAME
+
+    ids = api.mobygames_ids()
+    existing_filename = mobygames_companies_path()
+    if refresh_changed and not journal.exists() and existing_filename.exists():
+        processed_ids = []
+        if processed_filename.exists():
+            processed_ids = read_json(processed_filename)
+        journal.seed(dataset_games(existing_filename), ids, processed_ids)
+
+    # JSON Lines are streamed from the journal, only the processed ids are kept
+    streaming = output_format == "jsonl"
+    processed = set()
+    games = defaultdict(list)
+    for game_id, rows in journal.entries():
+        processed.add(game_id)
+        if not streaming:
+            games[game_id] += rows
+    if processed:
+        print(f"Skipping {len(processed)} games which are already processed.")
+
+    missing_ids = [id_ for id_ in ids if id_ not in processed]
+    entries = fetch_entries(
+        unified_api_url, "mobygames", missing_ids, workers, response_cache
+    )
+    with journal:
+        for id_, data in tqdm(entries, total=len(missing_ids)):
+            if not data:
+                continue
+            rows = list(company_rows(id_, data, pm))
+            journal.append(id_, rows)
+            if not streaming:
+                games[id_] = rows
+
+    if streaming:
+        write_jsonl_dataset(journal.entries(), set(ids), mg_companies_filename)
+    else:
+        dataset = defaultdict(list)
+        for id_ in ids:
+            for company_id, production_info in games.get(id_, []):
+                dataset[company_id].append(production_info)
+
+        with open(mg_companies_filename, "w") as f:
+            json.dump(dict(dataset), f, indent=4)
+    listed_ids = set(ids)
+    write_json(
+        [game_id for game_id, _ in journal.entries() if game_id in listed_ids],
+        processed_filename,
+    )
+    journal.remove()
+    if response_cache is not None:
+        response_cache.close()
 
     prov = Provenance(mg_companies_filename, overwrite=True)
     prov.add(
@@ -80,3 +298,28 @@ def build_mobygames_companies(unified_api_url=DIGGR_API):
     prov.save()
 
     return mg_companies_filename
+
+
+def build_columnar_companies():
+    """
+    Converts the mobygames companies dataset into the compact columnar format
+    (see ColumnarDataset) and returns the filename of the columnar dataset.
+    """
+    mg_companies_filename = mobygames_companies_path()
+    columnar = ColumnarDataset.from_mobygames_companies(
+        read_mobygames_companies(mg_companies_filename)
+    )
+
+    columnar_filename = Path(DATASETS_DIR) / MOBYGAMES_COMPANIES_COLUMNAR_FILENAME
+    columnar.save(columnar_filename)
+
+    prov = Provenance(columnar_filename, overwrite=True)
+    prov.add(
+        agents=[PROV_AGENT],
+        activity=COLUMNAR_PROV_ACTIVITY,
+        description=COLUMNAR_PROV_DESC,
+    )
+    prov.add_sources([mg_companies_filename])
+    prov.save()
+
+    return columnar_filename
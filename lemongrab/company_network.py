@@ -1,19 +1,26 @@
-import networkx as nx
+import heapq
+import pickle
 import yaml
 
+from .backbone import prune_weights
 from .combined_dataset import get_combined_dataset
-from itertools import combinations
+from .cooccurrence import cooccurrence, update_cooccurrence
+from .export import export_network
+from .network import Network
 from pathlib import Path
+from .profiling import StageProfiler
 from provit import Provenance
 from .settings import (
     COMPANY_NETWORKS_DIR,
     LOG_FILE_EXT,
     NETWORK_PROV_ACTIVITY,
     NETWORK_PROV_DESC,
+    NETWORK_STATE_EXT,
     PROV_AGENT,
 )
-from .utils import load_gamelist
-from tqdm import tqdm
+from .utils import load_gamelist, read_yaml
+
+STATE_VERSION = 1
 
 
 class CompanyNetworkBuilder:
@@ -36,6 +43,28 @@ class CompanyNetworkBuilder:
     * countries: resease country (can be multiple)
     * platform (can be multiple)
 
+    The edges are computed game by game: only companies which worked on the same
+    game are paired, companies without any common game are never compared.
+
+    An already loaded CombinedDataset can be passed as :dataset:, otherwise the
+    dataset is loaded when the network is built. With :jobs: > 1 the games are
+    split across that many processes.
+
+    With :profile: the wall time and peak RSS of the build stages (load, filter,
+    projection, annotation, export, provenance) are added to the log file.
+
+    The network is built as node and edge tables (build_graph returns it as networkx
+    Graph) and written in the export :format: (graphml, gexf, csv, parquet, see
+    export.py), with :compress: the files are gzip compressed.
+
+    With :incremental: the games of every node and the edges are kept in a state
+    file next to the network. The next build with the same filters only recounts
+    the edges of the nodes whose games changed and takes over all other edges.
+
+    Large networks can be pruned while they are built (see backbone.py): only the
+    :top_companies: with the most games become nodes, edges with less than
+    :min_weight: shared games are dropped and with :backbone: only the edges of
+    the disparity backbone at that significance level are kept.
     """
 
     def __init__(
@@ -46,6 +75,15 @@ class CompanyNetworkBuilder:
         roles=False,
         publisher=False,
         log_file_ext=LOG_FILE_EXT,
+        dataset=None,
+        jobs=1,
+        profile=False,
+        format="graphml",
+        compress=False,
+        incremental=False,
+        min_weight=1,
+        top_companies=None,
+        backbone=None,
     ):
 
         self.roles = roles
@@ -55,87 +93,70 @@ class CompanyNetworkBuilder:
         self.gamelist_file = gamelist
 
         self.log_file_ext = log_file_ext
+        self.dataset = dataset
+        self.jobs = jobs
+        self.format = format
+        self.compress = compress
+        self.incremental = incremental
+        self.min_weight = min_weight
+        self.top_companies = top_companies
+        self.backbone = backbone
+        self.profiler = StageProfiler(enabled=profile)
+        self.state = None
+        self.changed_nodes = None
+
+    def build(self, apply_filter=True):
+        """
+        Builds and writes the network. Without :apply_filter: the dataset is
+        expected to be filtered already, e.g. by a previous build with the same
+        filters (see batch.py).
+        """
 
-    def build(self):
-
-        g = nx.Graph()
-        all_games = set()
-
-        games = {}
-
-        self.dataset = get_combined_dataset()
-        if not self.gamelist_file:
-            self.dataset.set_filter([self.platform], self.countries)
-        else:
-            gamelist = load_gamelist(self.gamelist_file)
-            self.dataset.set_gamelist_filter(gamelist)
-
-        company_list = []
-        for company_id, production_roles in self.dataset.filtered_dataset.items():
-            company_list += self.company_ids(company_id, production_roles)
-
-        for c in company_list:
-            g.add_node(c)
-
-        for c1, c2 in tqdm(combinations(company_list, 2)):
-            if self.roles:
-                c1_id = c1.split("__")[0]
-                c1_role = c1.split("__")[1]
-                c2_id = c2.split("__")[0]
-                c2_role = c2.split("__")[1]
-            else:
-                c1_id = c1
-                c1_role = None
-                c2_id = c2
-                c2_role = None
-
-            if c1 not in games:
-                games[c1] = self._filter_games(
-                    self.dataset.filtered_dataset[c1_id],
-                    self.countries,
-                    self.platform,
-                    c1_role,
+        with self.profiler.stage("load"):
+            if self.dataset is None:
+                self.dataset = get_combined_dataset()
+
+        out_basename = Path(COMPANY_NETWORKS_DIR) / self.out_filename()
+        state_file = Path(f"{out_basename}.{NETWORK_STATE_EXT}")
+        previous = self.read_state(state_file) if self.incremental else None
+
+        network, all_games = self.build_network(apply_filter, previous)
+
+        with self.profiler.stage("export"):
+            out_files = export_network(
+                network.nodes(),
+                network.edges(),
+                out_basename,
+                self.format,
+                self.compress,
+            )
+            if self.incremental:
+                self.write_state(state_file)
+        out_file = out_files[0]
+
+        with self.profiler.stage("provenance"):
+            for filename in out_files:
+                prov = Provenance(filename)
+                prov.add(
+                    agents=[PROV_AGENT],
+                    activity=NETWORK_PROV_ACTIVITY,
+                    description=NETWORK_PROV_DESC.format(
+                        platforms=self.platform_str(self.platform),
+                        countries=self.countries_str(self.countries),
+                    ),
                 )
+                prov.save()
 
-            if c2 not in games:
-                games[c2] = self._filter_games(
-                    self.dataset.filtered_dataset[c2_id],
-                    self.countries,
-                    self.platform,
-                    c2_role,
-                )
+        n_nodes = network.number_of_nodes()
+        n_edges = network.number_of_edges()
+        self._write_log(out_file, n_nodes, n_edges, len(all_games))
 
-            overlap = games[c1].intersection(games[c2])
-            all_games = all_games.union(overlap)
-
-            if len(overlap) > 0:
-                g.add_edge(c1, c2, weight=len(overlap))
-
-        # add node information
-        for node in g.nodes():
-            id_ = node.split("__")[0]
-            if self.roles:
-                role = node.split("__")[1]
-
-            g.nodes[node]["country"] = self._get_wiki_country(id_)
-            if self.roles:
-                g.nodes[node]["company_name"] = self.dataset.filtered_dataset[id_][0][
-                    "company_name"
-                ]
-                g.nodes[node]["role"] = role
-                g.nodes[node]["label"] = (
-                    self.dataset.filtered_dataset[id_][0]["company_name"]
-                    + "("
-                    + role
-                    + ")"
-                )
-            else:
-                g.nodes[node]["label"] = self.dataset.filtered_dataset[id_][0][
-                    "company_name"
-                ]
-            g.nodes[node]["no_of_games"] = len(games[node])
+        return out_file, n_nodes, n_edges, len(all_games)
 
-        out_path = Path(COMPANY_NETWORKS_DIR)
+    def out_filename(self):
+        """
+        Returns the name of the network files (without extension).
+        """
         out_filename = "company_network_"
 
         if self.gamelist_file:
@@ -148,39 +169,242 @@ class CompanyNetworkBuilder:
             out_filename += "_roles"
         if self.publisher:
             out_filename += "_pub"
+        if self.top_companies:
+            out_filename += f"_top{self.top_companies}"
+        if self.min_weight > 1:
+            out_filename += f"_min{self.min_weight}"
+        if self.backbone is not None:
+            out_filename += f"_backbone{self.backbone}"
+        return out_filename
+
+    def parameters(self):
+        """
+        Returns the filters and options which determine the nodes and edges.
+        """
+        return {
+            "gamelist": self.gamelist_file,
+            "countries": sorted(self.countries or ()),
+            "platform": self.platform,
+            "roles": self.roles,
+            "publisher": self.publisher,
+            "top_companies": self.top_companies,
+        }
+
+    def read_state(self, state_file):
+        """
+        Returns the state of the previous build or None if there is none for the
+        current parameters.
+        """
+        if not Path(state_file).exists():
+            return None
+        with open(state_file, "rb") as f:
+            state = pickle.load(f)
+        if (
+            state.get("version") != STATE_VERSION
+            or state.get("parameters") != self.parameters()
+        ):
+            return None
+        return state
+
+    def write_state(self, state_file):
+        """
+        Writes the node names, the games of the nodes and the (unpruned) edges of
+        the last built network.
+        """
+        state = dict(self.state, version=STATE_VERSION, parameters=self.parameters())
+        tmp_file = Path(f"{state_file}.tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        tmp_file.replace(state_file)
+
+    def build_graph(self):
+        """
+        Filters the dataset and returns the company network as networkx Graph and
+        the set of games shared by at least two companies.
+        """
+        network, all_games = self.build_network()
+        return network.to_networkx(), all_games
+
+    def apply_filter(self):
+        """
+        Filters the dataset by platform and countries or by the gamelist.
+        """
+        with self.profiler.stage("filter"):
+            if not self.gamelist_file:
+                self.dataset.set_filter([self.platform], self.countries)
+            else:
+                gamelist = load_gamelist(self.gamelist_file)
+                self.dataset.set_gamelist_filter(gamelist)
+
+    def build_network(self, apply_filter=True, previous=None):
+        """
+        Filters the dataset and returns the company network as node and edge
+        tables (see network.py) and the set of games shared by at least two
+        companies.
+
+        With the state of a :previous: build (see read_state) only the edges of
+        the changed nodes are counted. The edges are pruned before the edge tables
+        are built, except in incremental builds, which keep the complete tables
+        for the next build.
+        """
+        if apply_filter:
+            self.apply_filter()
+
+        with self.profiler.stage("projection"):
+            names = []
+            node_companies = []
+            node_roles = []
+            node_games = []
+            for company_id, production_roles in self.dataset.filtered_dataset.items():
+                for role in self._company_roles(production_roles):
+                    names.append(self._node_name(company_id, role))
+                    node_companies.append(company_id)
+                    node_roles.append(role)
+                    node_games.append(
+                        self._filter_games(
+                            production_roles, self.countries, self.platform, role
+                        )
+                    )
+            if self.top_companies:
+                names, node_companies, node_roles, node_games = self._top_nodes(
+                    names, node_companies, node_roles, node_games
+                )
 
-        out_filename += ".graphml"
-        out_file = out_path / out_filename
-        nx.write_graphml(g, out_file)
-
-        prov = Provenance(out_file)
-        prov.add(
-            agents=[PROV_AGENT],
-            activity=NETWORK_PROV_ACTIVITY,
-            description=NETWORK_PROV_DESC.format(
-                platforms=self.platform_str(self.platform),
-                countries=self.countries_str(self.countries),
-            ),
+            network = Network(names)
+            if previous is None:
+                weights, all_games = cooccurrence(node_games, self.jobs)
+                if not self.incremental:
+                    weights = self._prune(weights, len(names))
+                network.add_edges(weights)
+            else:
+                changed, kept_edges = self._kept_edges(previous, names, node_games)
+                weights, all_games = update_cooccurrence(node_games, changed)
+                network.add_edges(weights, kept_edges)
+                self.changed_nodes = len(changed)
+            del weights
+
+            if self.incremental:
+                self.state = {
+                    "names": names,
+                    "node_games": node_games,
+                    "sources": network.sources,
+                    "targets": network.targets,
+                    "weights": network.weights,
+                }
+                if self.min_weight > 1 or self.backbone is not None:
+                    weights = dict(
+                        zip(zip(network.sources, network.targets), network.weights)
+                    )
+                    network = Network(names)
+                    network.add_edges(self._prune(weights, len(names)))
+                    del weights
+
+        with self.profiler.stage("annotation"):
+            self._annotate_nodes(network, node_companies, node_roles, node_games)
+
+        return network, all_games
+
+    def _top_nodes(self, names, node_companies, node_roles, node_games):
+        """
+        Returns the node lists restricted to the nodes of the top_companies
+        companies with the most games.
+        """
+        company_games = {}
+        for company_id, games in zip(node_companies, node_games):
+            company_games.setdefault(company_id, set()).update(games)
+        top = set(
+            heapq.nlargest(
+                self.top_companies, company_games, key=lambda c: len(company_games[c])
+            )
+        )
+        keep = [i for i, company_id in enumerate(node_companies) if company_id in top]
+        return (
+            [names[i] for i in keep],
+            [node_companies[i] for i in keep],
+            [node_roles[i] for i in keep],
+            [node_games[i] for i in keep],
         )
-        prov.save()
 
-        self._write_log(out_file, len(g.nodes), len(g.edges), len(all_games))
+    def _prune(self, weights, n_nodes):
+        """
+        Applies the min_weight and backbone filters to the edges of :weights:.
+        """
+        if self.min_weight <= 1 and self.backbone is None:
+            return weights
+        return prune_weights(weights, n_nodes, self.min_weight, self.backbone)
 
-        return out_file, len(g.nodes), len(g.edges), len(all_games)
+    def _kept_edges(self, previous, names, node_games):
+        """
+        Compares the nodes with the :previous: state. Returns the ids of the new or
+        changed nodes and the edges between the unchanged nodes, which are taken
+        over from the previous build, as sorted (node_1, node_2, weight) tuples.
+        """
+        previous_ids = {name: i for i, name in enumerate(previous["names"])}
+        previous_games = previous["node_games"]
+        new_ids = [-1] * len(previous_ids)
+        changed = set()
+        for i, name in enumerate(names):
+            j = previous_ids.get(name)
+            if j is None or previous_games[j] != node_games[i]:
+                changed.add(i)
+            else:
+                new_ids[j] = i
+
+        edges = (
+            (new_ids[source], new_ids[target], weight)
+            for source, target, weight in zip(
+                previous["sources"], previous["targets"], previous["weights"]
+            )
+            if new_ids[source] >= 0 and new_ids[target] >= 0
+        )
+        # the previous edges stay sorted as long as the node order is unchanged
+        kept_ids = [i for i in new_ids if i >= 0]
+        if any(i_1 > i_2 for i_1, i_2 in zip(kept_ids, kept_ids[1:])):
+            edges = sorted((min(n_1, n_2), max(n_1, n_2), w) for n_1, n_2, w in edges)
+        return changed, edges
+
+    def _annotate_nodes(self, network, node_companies, node_roles, node_games):
+        """
+        Adds the country, label, name, role and number of games columns to the node
+        table of :network:.
+        """
+        filtered_dataset = self.dataset.filtered_dataset
+        company_names = [filtered_dataset[c][0]["company_name"] for c in node_companies]
+
+        attributes = network.attributes
+        attributes["country"] = [self._get_wiki_country(c) for c in node_companies]
+        if self.roles:
+            attributes["company_name"] = company_names
+            attributes["role"] = node_roles
+            attributes["label"] = [
+                f"{name}({role})" for name, role in zip(company_names, node_roles)
+            ]
+        else:
+            attributes["label"] = company_names
+        attributes["no_of_games"] = [len(games) for games in node_games]
 
     def _write_log(self, out_file, n_nodes, n_edges, n_games):
         """
         Write the parameters and results into a logfile.
         """
         log = {
-            "countries": list(self.countries),
+            "gamelist": self.gamelist_file,
+            "countries": list(self.countries or ()),
             "platform": self.platform,
             "roles": self.roles,
             "publisher": self.publisher,
+            "format": self.format,
+            "compress": self.compress,
+            "min_weight": self.min_weight,
+            "top_companies": self.top_companies,
+            "backbone": self.backbone,
             "nodes": n_nodes,
             "edges": n_edges,
             "games": n_games,
         }
+        if self.changed_nodes is not None:
+            log["changed_nodes"] = self.changed_nodes
+        log.update(self.profiler.log())
 
         with open(f"{out_file}_log.{self.log_file_ext}", "w") as outfile:
             yaml.dump(log, outfile)
@@ -193,17 +417,24 @@ class CompanyNetworkBuilder:
         otherwise just returns company id:
         ["COMPANY_ID"]
         """
-        ids = []
-        if self.roles:
-            roles = set([x["production_role"] for x in games])
-            for role in roles:
-                if not self.publisher and role == "Published by":
-                    continue
+        return [
+            self._node_name(company_id, role) for role in self._company_roles(games)
+        ]
 
-                ids.append("{}__{}".format(company_id, role))
-            return ids
-        else:
-            return [company_id]
+    def _company_roles(self, games):
+        """
+        Returns the production roles of the nodes of a company, or [None] if roles
+        are not considered.
+        """
+        if not self.roles:
+            return [None]
+        roles = set([x["production_role"] for x in games])
+        return [role for role in roles if self.publisher or role != "Published by"]
+
+    def _node_name(self, company_id, role):
+        if role is None:
+            return company_id
+        return "{}__{}".format(company_id, role)
 
     def _filter_games(self, ds, countries, platform, role):
         """
@@ -257,11 +488,91 @@ class CompanyNetworkBuilder:
 
 
 def build_company_network(
-    gamelist=None, countries=None, platform=None, roles=False, publisher=False
+    gamelist=None,
+    countries=None,
+    platform=None,
+    roles=False,
+    publisher=False,
+    jobs=1,
+    profile=False,
+    format="graphml",
+    compress=False,
+    incremental=False,
+    min_weight=1,
+    top_companies=None,
+    backbone=None,
 ):
     """
     CompanyNetworkBuilder factory which runs the build
     and returns stats about the result.
     """
-    cn_builder = CompanyNetworkBuilder(gamelist, countries, platform, roles, publisher)
+    cn_builder = CompanyNetworkBuilder(
+        gamelist,
+        countries,
+        platform,
+        roles,
+        publisher,
+        jobs=jobs,
+        profile=profile,
+        format=format,
+        compress=compress,
+        incremental=incremental,
+        min_weight=min_weight,
+        top_companies=top_companies,
+        backbone=backbone,
+    )
     return cn_builder.build()
+
+
+def read_network_logs(
+    company_networks_dir=COMPANY_NETWORKS_DIR, log_file_ext=LOG_FILE_EXT
+):
+    """
+    Returns the parameters of all company networks in :company_networks_dir: as
+    keyword arguments of CompanyNetworkBuilder, read from their log files. Logs of
+    sample networks are skipped.
+    """
+    networks = []
+    for logfilename in sorted(Path(company_networks_dir).glob(f"*_log.{log_file_ext}")):
+        log = read_yaml(logfilename)
+        if not log or "platform" not in log:
+            continue
+        networks.append(
+            {
+                "gamelist": log.get("gamelist"),
+                "countries": tuple(log.get("countries") or ()),
+                "platform": log.get("platform"),
+                "roles": log.get("roles", False),
+                "publisher": log.get("publisher", False),
+                "format": log.get("format", "graphml"),
+                "compress": log.get("compress", False),
+                "min_weight": log.get("min_weight", 1),
+                "top_companies": log.get("top_companies"),
+                "backbone": log.get("backbone"),
+            }
+        )
+    return networks
+
+
+def rebuild_company_networks(jobs=1, profile=False, dataset=None):
+    """
+    Rebuilds all company networks of the project with the parameters of their
+    logs. The dataset is loaded once and the networks are built incrementally,
+    so only the edges of the changed companies are counted again.
+
+    Returns the build results (out_file, nodes, edges, games) of all networks.
+    """
+    if dataset is None:
+        dataset = get_combined_dataset()
+
+    results = []
+    for parameters in read_network_logs():
+        builder = CompanyNetworkBuilder(
+            **parameters,
+            dataset=dataset,
+            jobs=jobs,
+            profile=profile,
+            incremental=True,
+        )
+        results.append(builder.build())
+    return results
@@ -0,0 +1,100 @@
+"""
+Projection of the company-game incidence onto company pairs.
+
+Instead of comparing the games of every pair of companies, the projection starts
+from each game and only counts the pairs of companies which actually worked on it
+together.
+
+Large projections can be split across processes: the games are sharded, every
+process counts the pairs of its shard and the partial counts are added up.
+
+After a dataset refresh, a previous projection can be updated instead: only the
+pairs of the nodes whose games changed are counted again.
+"""
+
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from tqdm import tqdm
+
+
+def game_nodes(node_games):
+    """
+    Inverts a list of game sets (one per node) into a dictionary
+    game -> ascending list of node ids.
+    """
+    nodes = defaultdict(list)
+    for node, games in enumerate(node_games):
+        for game in games:
+            nodes[game].append(node)
+    return nodes
+
+
+def count_pairs(node_lists):
+    """
+    Returns a Counter of all node pairs in the lists of :node_lists:.
+    """
+    weights = Counter()
+    for nodes in node_lists:
+        weights.update(combinations(nodes, 2))
+    return weights
+
+
+def shard(node_lists, n_shards):
+    """
+    Splits :node_lists: into :n_shards: shards with a similar number of pairs.
+    """
+    shards = [[] for _ in range(n_shards)]
+    by_size = sorted(node_lists, key=len, reverse=True)
+    for i, nodes in enumerate(by_size):
+        shards[i % n_shards].append(nodes)
+    return shards
+
+
+def cooccurrence(node_games, jobs=1):
+    """
+    Counts the games shared by the nodes. :node_games: is a list with the set of
+    games of every node, the node ids are the list positions. With :jobs: > 1 the
+    pairs are counted by that many worker processes.
+
+    Returns a tuple (weights, shared_games):
+    weights:      Counter (node_1, node_2) -> number of shared games, node_1 < node_2
+    shared_games: set of all games shared by at least two nodes
+    """
+    shared_games = set()
+    node_lists = []
+    for game, nodes in game_nodes(node_games).items():
+        if len(nodes) > 1:
+            shared_games.add(game)
+            node_lists.append(nodes)
+
+    if jobs <= 1:
+        return count_pairs(tqdm(node_lists)), shared_games
+
+    weights = Counter()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        partial_weights = executor.map(count_pairs, shard(node_lists, jobs))
+        for partial in tqdm(partial_weights, total=jobs):
+            weights.update(partial)
+    return weights, shared_games
+
+
+def update_cooccurrence(node_games, changed):
+    """
+    Counts the games shared by the :changed: nodes (a set of node ids) with any
+    other node. The pairs of unchanged nodes are not counted, their weights can be
+    taken over from a previous projection. Only the games of the changed nodes are
+    visited.
+
+    Returns a tuple (weights, shared_games) like cooccurrence.
+    """
+    nodes_of_game = game_nodes(node_games)
+    shared_games = {game for game, nodes in nodes_of_game.items() if len(nodes) > 1}
+    weights = Counter()
+    for node in changed:
+        for game in node_games[node]:
+            for other in nodes_of_game[game]:
+                if other == node or (other in changed and other < node):
+                    continue
+                weights[min(node, other), max(node, other)] += 1
+    return weights, shared_games
@@ -2,8 +2,21 @@
 Simple wrapper for diggr api for easier data access
 """
 
+import json
 import requests
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from requests.adapters import HTTPAdapter
+from .settings import (
+    DIGGR_API_BULK,
+    DIGGR_API_BULK_SIZE,
+    DIGGR_API_GZIP,
+    DIGGR_API_KEEP_ALIVE,
+    DIGGR_API_POOL_SIZE,
+)
+
 MA_IDS = "/mediaartdb"
 MG_IDS = "/mobygames"
 
@@ -13,31 +26,96 @@ LINKS = "/{dataset}/{id}/links"
 
 ENTRY = "/{dataset}/{id}"
 
+ENTRIES = "/{dataset}?ids={ids}"
+
 
 class DiggrApi:
     """
     Wrapper around the unifiedAPI by diggr.
+
+    With a ResponseCache as :cache:, responses are stored on disk and reused as
+    long as they are fresh or the server confirms they are unchanged (see
+    http_cache.py). The id lists are always revalidated.
+
+    The session keeps up to :pool_size: connections open, so that many threads
+    can share it. Without :keep_alive: every request uses a new connection, without
+    :gzip: the responses are requested uncompressed.
+
+    With :bulk:, entries are fetched with multi-id requests of :bulk_size: ids.
+    These are not part of the documented UnifiedAPI: the server is assumed to
+    answer GET /{dataset}?ids=1,2,3 with {"entries": {"1": entry, ...}}, leaving
+    out unknown ids. Servers without multi-id requests answer with the id list of
+    the dataset instead, which is detected on the first request (see entries).
     """
 
-    def __init__(self, base_url):
+    def __init__(
+        self,
+        base_url,
+        cache=None,
+        pool_size=DIGGR_API_POOL_SIZE,
+        keep_alive=DIGGR_API_KEEP_ALIVE,
+        gzip=DIGGR_API_GZIP,
+        bulk=DIGGR_API_BULK,
+        bulk_size=DIGGR_API_BULK_SIZE,
+    ):
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Connection"] = "keep-alive" if keep_alive else "close"
+        self.session.headers["Accept-Encoding"] = (
+            "gzip, deflate" if gzip else "identity"
+        )
         self.base_url = base_url
+        self.cache = cache
+        self.bulk = bulk
+        self.bulk_size = bulk_size
+        # dataset -> whether the UnifiedAPI answers multi-id requests
+        self.bulk_support = {}
 
-    def _call(self, url):
+    def _call(self, url, ttl=None):
         try:
-            rsp = self.session.get(url)
-            data = rsp.json()
-            return data
+            if self.cache is None:
+                rsp = self.session.get(url)
+                data = rsp.json()
+                return data
+            return self._cached_call(url, ttl)
         except Exception:
             print("invalid api call: {}".format(url))
             return None
 
+    def _cached_call(self, url, ttl=None):
+        cached = self.cache.get(url)
+        headers = {}
+        if cached is not None:
+            if self.cache.is_fresh(cached, ttl):
+                return json.loads(cached.body)
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        rsp = self.session.get(url, headers=headers)
+        if rsp.status_code == 304 and cached is not None:
+            self.cache.revalidated(url)
+            return json.loads(cached.body)
+
+        data = rsp.json()
+        if rsp.status_code == 200:
+            self.cache.put(
+                url,
+                rsp.content,
+                rsp.headers.get("ETag"),
+                rsp.headers.get("Last-Modified"),
+            )
+        return data
+
     def mobygames_ids(self):
-        data = self._call(self.base_url + MG_IDS)
+        data = self._call(self.base_url + MG_IDS, ttl=0)
         return data["ids"]
 
     def mediaartdb_ids(self):
-        data = self._call(self.base_url + MA_IDS)
+        data = self._call(self.base_url + MA_IDS, ttl=0)
         return data["ids"]
 
     def links(self, dataset, id_):
@@ -52,6 +130,64 @@ class DiggrApi:
             print("no data available for {}/{}".format(dataset, id_))
             return None
 
+    def _bulk_entries(self, dataset, ids):
+        """
+        Returns the id -> entry dictionary of a multi-id request or None if the
+        UnifiedAPI does not support them. Older versions ignore the ids parameter
+        and answer with the id list.
+        """
+        url = ENTRIES.format(dataset=dataset, ids=",".join(str(id_) for id_ in ids))
+        data = self._call(self.base_url + url)
+        if not isinstance(data, dict) or not isinstance(data.get("entries"), dict):
+            return None
+        entries = data["entries"]
+        for id_ in ids:
+            if str(id_) not in entries:
+                print("no data available for {}/{}".format(dataset, id_))
+        return {id_: entries.get(str(id_)) for id_ in ids}
+
+    def entries(self, dataset, ids, workers=1):
+        """
+        Fetches the entries of :dataset: for all :ids: and yields (id, entry)
+        tuples in the order of :ids:.
+
+        With bulk enabled, the entries are fetched in chunks of bulk_size ids.
+        The first request is sent with a single id: if the UnifiedAPI does not
+        answer it with entries, multi-id requests are not tried again for the
+        dataset. Otherwise the entries are fetched one by one. Either way
+        :workers: requests are pipelined on the shared session.
+        """
+
+        def fetch_entry(id_):
+            return self.entry(dataset, id_)
+
+        def fetch_chunk(chunk):
+            entries = self._bulk_entries(dataset, chunk)
+            if entries is None:
+                entries = {id_: self.entry(dataset, id_) for id_ in chunk}
+            return entries
+
+        ids = iter(ids)
+        if self.bulk and dataset not in self.bulk_support:
+            # a request for the first id tells whether multi-id requests work
+            first = list(islice(ids, 1))
+            if not first:
+                return
+            entries = self._bulk_entries(dataset, first)
+            self.bulk_support[dataset] = entries is not None
+            if entries is None:
+                ids = chain(first, ids)
+            else:
+                yield from entries.items()
+
+        if self.bulk and self.bulk_support[dataset]:
+            chunks = iter(lambda: list(islice(ids, self.bulk_size)), [])
+            for _, entries in pipelined(fetch_chunk, chunks, workers):
+                yield from entries.items()
+            return
+
+        yield from pipelined(fetch_entry, ids, workers)
+
     def mobygames_slug_to_id(self, slug):
         data = self._call(self.base_url + MG_BY_SLUG.format(slug=slug))
         try:
@@ -59,3 +195,41 @@ class DiggrApi:
         except Exception:
             print("couldn't retrieve mobygames id for slug {}".format(slug))
             return None
+
+
+def pipelined(fetch, items, workers=1):
+    """
+    Calls :fetch: for all :items: in :workers: threads and yields (item, result)
+    tuples in the order of :items:. At most 2 * :workers: items are requested ahead
+    of the consumer, so a slow consumer throttles the fetching instead of piling up
+    downloaded results in memory.
+    """
+    max_pending = 2 * workers
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in items:
+                pending.append((item, executor.submit(fetch, item)))
+                if len(pending) >= max_pending:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def fetch_entries(base_url, dataset, ids, workers=1, cache=None, bulk=DIGGR_API_BULK):
+    """
+    Fetches the entries of :dataset: for all :ids: using :workers: parallel requests.
+
+    Yields (id, entry) tuples in the order of :ids:. The workers share one DiggrApi
+    session with a connection pool of :workers: connections and the optional
+    response :cache:. See DiggrApi.entries for the multi-id requests of :bulk:.
+    """
+    api = DiggrApi(
+        base_url, cache, pool_size=max(workers, DIGGR_API_POOL_SIZE), bulk=bulk
+    )
+    yield from api.entries(dataset, ids, workers)
@@ -0,0 +1,299 @@
+"""
+Export of company networks.
+
+The writers stream the nodes and edges of a network into the output files instead
+of building an XML tree (like networkx does), so large networks are written fast
+and with little memory. Supported formats:
+
+graphml   GraphML file, readable by Gephi and networkx
+gexf      GEXF 1.2 file, the native format of Gephi
+csv       node and edge CSV files for the spreadsheet import of Gephi
+parquet   node and edge Parquet tables (requires pyarrow)
+
+The text formats can be gzip compressed, Parquet tables are compressed with gzip
+instead of snappy.
+
+Nodes are given as (node_id, attribute dictionary) tuples, edges as
+(source, target, weight) tuples, e.g. for a Network (see network.py) or a networkx
+graph:
+export_network(network.nodes(), network.edges(), basename, "gexf")
+export_network(g.nodes(data=True), network_edges(g), basename, "gexf")
+"""
+
+import csv
+import gzip
+
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+FORMATS = ["graphml", "gexf", "csv", "parquet"]
+
+# python type -> GraphML/GEXF attribute type
+ATTRIBUTE_TYPES = {bool: "boolean", int: "long", float: "double", str: "string"}
+
+PARQUET_BATCH_SIZE = 100000
+GZIP_LEVEL = 6
+
+GRAPHML_HEADER = (
+    "<?xml version='1.0' encoding='utf-8'?>\n"
+    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+    'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n'
+)
+
+GEXF_HEADER = (
+    "<?xml version='1.0' encoding='utf-8'?>\n"
+    '<gexf xmlns="http://www.gexf.net/1.2draft" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.gexf.net/1.2draft '
+    'http://www.gexf.net/1.2draft/gexf.xsd" version="1.2">\n'
+    "  <meta>\n"
+    "    <creator>lemongrab</creator>\n"
+    "  </meta>\n"
+)
+
+
+def network_edges(g):
+    """
+    Returns the (source, target, weight) tuples of the networkx graph :g:.
+    """
+    return ((u, v, d["weight"]) for u, v, d in g.edges(data=True))
+
+
+def check_format(format):
+    """
+    Raises a RuntimeError if :format: is unknown or its requirements are missing.
+    """
+    if format not in FORMATS:
+        raise RuntimeError(f"Unknown export format {format}.")
+    if format == "parquet":
+        _import_pyarrow()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError(
+            "The parquet export requires pyarrow. Install it with: pip install pyarrow"
+        )
+    return pyarrow, pyarrow.parquet
+
+
+def _open(filename, compress):
+    if compress:
+        return gzip.open(
+            filename, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8", newline=""
+        )
+    return open(filename, "w", encoding="utf-8", newline="")
+
+
+def _value_type(value):
+    for type_ in [bool, int, float]:
+        if isinstance(value, type_):
+            return ATTRIBUTE_TYPES[type_]
+    return ATTRIBUTE_TYPES[str]
+
+
+def _attribute_types(nodes, exclude=()):
+    """
+    Returns the attribute name -> type dictionary of all :nodes:, the type of an
+    attribute is the one of its first value.
+    """
+    attributes = {}
+    for _, data in nodes:
+        for key, value in data.items():
+            if key not in attributes and key not in exclude:
+                attributes[key] = _value_type(value)
+    return attributes
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def write_graphml(nodes, edges, outfilename, compress=False):
+    nodes = list(nodes)
+    attributes = _attribute_types(nodes)
+    keys = {name: f"d{i}" for i, name in enumerate(attributes)}
+    weight_key = f"d{len(keys)}"
+
+    with _open(outfilename, compress) as f:
+        f.write(GRAPHML_HEADER)
+        for name, type_ in attributes.items():
+            f.write(
+                f'  <key id="{keys[name]}" for="node" '
+                f'attr.name={quoteattr(name)} attr.type="{type_}" />\n'
+            )
+        f.write(
+            f'  <key id="{weight_key}" for="edge" attr.name="weight" '
+            'attr.type="long" />\n'
+        )
+        f.write('  <graph edgedefault="undirected">\n')
+        for node, data in nodes:
+            f.write(f"    <node id={quoteattr(str(node))}>\n")
+            for name, value in data.items():
+                f.write(
+                    f'      <data key="{keys[name]}">{escape(_text(value))}</data>\n'
+                )
+            f.write("    </node>\n")
+        for source, target, weight in edges:
+            f.write(
+                f"    <edge source={quoteattr(str(source))} "
+                f"target={quoteattr(str(target))}>\n"
+                f'      <data key="{weight_key}">{weight}</data>\n'
+                "    </edge>\n"
+            )
+        f.write("  </graph>\n</graphml>\n")
+    return outfilename
+
+
+def write_gexf(nodes, edges, outfilename, compress=False):
+    nodes = list(nodes)
+    attributes = _attribute_types(nodes, exclude=["label"])
+    ids = {name: str(i) for i, name in enumerate(attributes)}
+
+    with _open(outfilename, compress) as f:
+        f.write(GEXF_HEADER)
+        f.write('  <graph defaultedgetype="undirected" mode="static">\n')
+        f.write('    <attributes mode="static" class="node">\n')
+        for name, type_ in attributes.items():
+            f.write(
+                f'      <attribute id="{ids[name]}" title={quoteattr(name)} '
+                f'type="{type_}" />\n'
+            )
+        f.write("    </attributes>\n")
+        f.write("    <nodes>\n")
+        for node, data in nodes:
+            label = data.get("label", node)
+            f.write(
+                f"      <node id={quoteattr(str(node))} "
+                f"label={quoteattr(str(label))}>\n"
+                "        <attvalues>\n"
+            )
+            for name, value in data.items():
+                if name in ids:
+                    f.write(
+                        f'          <attvalue for="{ids[name]}" '
+                        f"value={quoteattr(_text(value))} />\n"
+                    )
+            f.write("        </attvalues>\n      </node>\n")
+        f.write("    </nodes>\n    <edges>\n")
+        for i, (source, target, weight) in enumerate(edges):
+            f.write(
+                f'      <edge id="{i}" source={quoteattr(str(source))} '
+                f'target={quoteattr(str(target))} weight="{weight}" />\n'
+            )
+        f.write("    </edges>\n  </graph>\n</gexf>\n")
+    return outfilename
+
+
+def write_csv(nodes, edges, nodes_filename, edges_filename, compress=False):
+    """
+    Writes a node table (Id, Label, attributes) and an edge table (Source, Target,
+    Type, Weight) with the column names of the Gephi spreadsheet import.
+    """
+    nodes = list(nodes)
+    attributes = list(_attribute_types(nodes, exclude=["label"]))
+
+    with _open(nodes_filename, compress) as f:
+        writer = csv.writer(f)
+        writer.writerow(["Id", "Label"] + attributes)
+        for node, data in nodes:
+            writer.writerow(
+                [node, data.get("label", node)]
+                + [data.get(name, "") for name in attributes]
+            )
+
+    with _open(edges_filename, compress) as f:
+        writer = csv.writer(f)
+        writer.writerow(["Source", "Target", "Type", "Weight"])
+        writer.writerows(
+            (source, target, "Undirected", weight) for source, target, weight in edges
+        )
+    return nodes_filename, edges_filename
+
+
+def write_parquet(nodes, edges, nodes_filename, edges_filename, compress=False):
+    """
+    Writes a node table (id and attributes) and an edge table (source, target,
+    weight). The edges are written in batches of PARQUET_BATCH_SIZE rows.
+    """
+    pa, pq = _import_pyarrow()
+    compression = "gzip" if compress else "snappy"
+
+    nodes = list(nodes)
+    attributes = list(_attribute_types(nodes))
+    columns = {"id": [str(node) for node, _ in nodes]}
+    for name in attributes:
+        columns[name] = [data.get(name) for _, data in nodes]
+    pq.write_table(pa.table(columns), nodes_filename, compression=compression)
+
+    schema = pa.schema(
+        [("source", pa.string()), ("target", pa.string()), ("weight", pa.int64())]
+    )
+    with pq.ParquetWriter(edges_filename, schema, compression=compression) as writer:
+        batch = []
+        for edge in edges:
+            batch.append(edge)
+            if len(batch) == PARQUET_BATCH_SIZE:
+                writer.write_table(_edge_table(pa, schema, batch))
+                batch = []
+        writer.write_table(_edge_table(pa, schema, batch))
+    return nodes_filename, edges_filename
+
+
+def _edge_table(pa, schema, batch):
+    sources, targets, weights = zip(*batch) if batch else ((), (), ())
+    return pa.table(
+        [list(map(str, sources)), list(map(str, targets)), list(weights)],
+        schema=schema,
+    )
+
+
+def export_filenames(basename, format="graphml", compress=False):
+    """
+    Returns the output files of a network export to :basename: (a path without
+    extension).
+    """
+    gz = ".gz" if compress and format != "parquet" else ""
+    if format in ["csv", "parquet"]:
+        return [
+            Path(f"{basename}_nodes.{format}{gz}"),
+            Path(f"{basename}_edges.{format}{gz}"),
+        ]
+    return [Path(f"{basename}.{format}{gz}")]
+
+
+def export_basename(filename):
+    """
+    Returns :filename: without the extensions of the export formats and gzip.
+    """
+    path = Path(filename)
+    if path.suffix == ".gz":
+        path = path.with_suffix("")
+    if path.suffix[1:] in FORMATS:
+        path = path.with_suffix("")
+    return path
+
+
+def export_network(nodes, edges, basename, format="graphml", compress=False):
+    """
+    Writes the network to :basename: plus the extension of :format: and returns the
+    list of written files.
+    """
+    check_format(format)
+    filenames = export_filenames(basename, format, compress)
+    if format == "graphml":
+        write_graphml(nodes, edges, *filenames, compress=compress)
+    elif format == "gexf":
+        write_gexf(nodes, edges, *filenames, compress=compress)
+    elif format == "csv":
+        write_csv(nodes, edges, *filenames, compress=compress)
+    else:
+        write_parquet(nodes, edges, *filenames, compress=compress)
+    return filenames
@@ -0,0 +1,131 @@
+"""
+Persistent cache of HTTP responses in a SQLite database.
+
+Responses are stored by URL with their ETag and Last-Modified headers. A cached
+response is used without asking the server while it is younger than the TTL. After
+that it is revalidated with a conditional request (If-None-Match/If-Modified-Since);
+if the server answers 304 Not Modified, the cached body is used again.
+
+If the cache grows beyond its maximum size, the least recently used responses are
+evicted.
+"""
+
+import sqlite3
+import threading
+import time
+
+from collections import namedtuple
+
+CachedResponse = namedtuple(
+    "CachedResponse", ["body", "etag", "last_modified", "fetched_at"]
+)
+
+# check the cache size after every EVICTION_INTERVAL stored responses
+EVICTION_INTERVAL = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+)
+"""
+
+
+class ResponseCache:
+    """
+    SQLite response cache, see module docstring. :ttl: is the time in seconds a
+    response is used without revalidation, :max_size: the maximum size of all
+    cached bodies in bytes. The cache can be shared by several threads.
+    """
+
+    def __init__(self, filename, ttl, max_size):
+        self.filename = filename
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._db = sqlite3.connect(str(filename), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(SCHEMA)
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS accessed ON responses (accessed_at)"
+            )
+
+    def get(self, url):
+        """
+        Returns the CachedResponse of :url: or None.
+        """
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses "
+                "WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?",
+                (time.time(), url),
+            )
+        return CachedResponse(*row)
+
+    def is_fresh(self, cached, ttl=None):
+        """
+        True if :cached: is younger than :ttl: (default: the TTL of the cache).
+        """
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() - cached.fetched_at < ttl
+
+    def put(self, url, body, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now, len(body)),
+            )
+            self._puts += 1
+            if self._puts % EVICTION_INTERVAL == 0:
+                self._evict()
+
+    def revalidated(self, url):
+        """
+        Marks the cached response of :url: as fresh again, after the server
+        confirmed it is unchanged.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url)
+            )
+
+    def evict(self):
+        with self._lock, self._db:
+            self._evict()
+
+    def _evict(self):
+        """
+        Deletes the least recently used responses until the cache fits into
+        max_size. Must be called with the lock held.
+        """
+        total = self._db.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+        if not total or total <= self.max_size:
+            return
+        excess = total - self.max_size
+        urls = []
+        for url, size in self._db.execute(
+            "SELECT url, size FROM responses ORDER BY accessed_at"
+        ):
+            urls.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM responses WHERE url = ?", urls)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
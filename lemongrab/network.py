@@ -0,0 +1,77 @@
+"""
+Company networks as node and edge tables.
+
+Building a networkx Graph costs several dictionaries per node and edge. Networks
+are therefore built as tables: the nodes have integer ids (their positions), node
+attributes are stored column by column and the edges are typed arrays of node ids
+and weights. A networkx Graph is only created on request with to_networkx.
+"""
+
+import heapq
+import networkx as nx
+
+from array import array
+
+
+class Network:
+    """
+    Undirected, weighted network.
+
+    Node i is named names[i], its attributes are attributes[<attribute>][i]. Edge k
+    connects the nodes sources[k] and targets[k] and has the weight weights[k].
+    """
+
+    def __init__(self, names, attributes=None):
+        self.names = names
+        self.attributes = attributes if attributes is not None else {}
+        self.sources = array("I")
+        self.targets = array("I")
+        self.weights = array("I")
+
+    def add_edges(self, weights, edges=None):
+        """
+        Adds the edges of a (node_1, node_2) -> weight dictionary of node ids, in
+        the order of the node ids. :edges: are further (node_1, node_2, weight)
+        tuples in that order (e.g. taken over from a previous network), which are
+        merged with the edges of :weights:.
+        """
+        if edges is None:
+            for node_1, node_2 in sorted(weights):
+                self.sources.append(node_1)
+                self.targets.append(node_2)
+                self.weights.append(weights[node_1, node_2])
+            return
+
+        new_edges = ((n_1, n_2, weights[n_1, n_2]) for n_1, n_2 in sorted(weights))
+        for node_1, node_2, weight in heapq.merge(new_edges, edges):
+            self.sources.append(node_1)
+            self.targets.append(node_2)
+            self.weights.append(weight)
+
+    def number_of_nodes(self):
+        return len(self.names)
+
+    def number_of_edges(self):
+        return len(self.weights)
+
+    def nodes(self):
+        """
+        Yields (name, attribute dictionary) tuples of all nodes.
+        """
+        columns = list(self.attributes.items())
+        for i, name in enumerate(self.names):
+            yield name, {attribute: column[i] for attribute, column in columns}
+
+    def edges(self):
+        """
+        Yields (source name, target name, weight) tuples of all edges.
+        """
+        names = self.names
+        for source, target, weight in zip(self.sources, self.targets, self.weights):
+            yield names[source], names[target], weight
+
+    def to_networkx(self):
+        g = nx.Graph()
+        g.add_nodes_from(self.nodes())
+        g.add_weighted_edges_from(self.edges())
+        return g
@@ -0,0 +1,137 @@
+"""
+Stage profiling of the network builds.
+
+profiler = StageProfiler()
+with profiler.stage("filter"):
+    dataset.set_filter(platforms, countries)
+log.update(profiler.log())
+
+For every stage the wall time and the peak resident set size (RSS) during the stage
+are recorded. On Linux the high-water mark of the process is reset at the start of
+each stage (/proc/self/clear_refs), so the peak belongs to the stage alone. Worker
+processes count if they set a new peak during the stage.
+
+Where the high-water mark cannot be reset, the increase of the lifetime peak RSS
+during the stage is recorded as profile_<stage>_rss_growth_mb instead; it is 0 for
+stages which stay below an earlier peak. Neither is available on platforms without
+the resource module (Windows).
+"""
+
+import sys
+import time
+
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+CLEAR_REFS = "/proc/self/clear_refs"
+PROC_STATUS = "/proc/self/status"
+
+
+def _max_rss_mb(who):
+    max_rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is given in bytes on macOS and in KiB everywhere else
+    if sys.platform == "darwin":
+        return round(max_rss / 2**20, 1)
+    return round(max_rss / 2**10, 1)
+
+
+def peak_rss_mb():
+    """
+    Returns the peak RSS of the process and its children since their start in MiB,
+    or None.
+    """
+    if resource is None:
+        return None
+    return max(_max_rss_mb(resource.RUSAGE_SELF), _max_rss_mb(resource.RUSAGE_CHILDREN))
+
+
+def children_peak_rss_mb():
+    """
+    Returns the peak RSS of the finished child processes in MiB, or None.
+    """
+    if resource is None:
+        return None
+    return _max_rss_mb(resource.RUSAGE_CHILDREN)
+
+
+def reset_peak_rss():
+    """
+    Resets the RSS high-water mark of the process (Linux only). Returns False if
+    it cannot be reset.
+    """
+    try:
+        with open(CLEAR_REFS, "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return current_peak_rss_mb() is not None
+
+
+def current_peak_rss_mb():
+    """
+    Returns the RSS high-water mark of the process since the last reset in MiB
+    (VmHWM), or None.
+    """
+    try:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 2**10, 1)
+    except OSError:
+        pass
+    return None
+
+
+class StageProfiler:
+    """
+    Records wall time and peak RSS of named stages. A disabled profiler records
+    nothing and returns an empty log.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        resettable = reset_peak_rss()
+        start_peak = peak_rss_mb()
+        start_children_peak = children_peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            stage = self.stages.get(name, {"seconds": 0})
+            stage["seconds"] = round(stage["seconds"] + seconds, 3)
+            if resettable:
+                peak = current_peak_rss_mb()
+                children_peak = children_peak_rss_mb()
+                if children_peak is not None and children_peak > start_children_peak:
+                    peak = max(peak, children_peak)
+                stage["peak_rss_mb"] = max(peak, stage.get("peak_rss_mb", 0))
+            elif start_peak is not None:
+                growth = round(peak_rss_mb() - start_peak, 1)
+                stage["rss_growth_mb"] = round(
+                    stage.get("rss_growth_mb", 0) + growth, 1
+                )
+            self.stages[name] = stage
+
+    def log(self):
+        """
+        Returns the flat log entries profile_<stage>_seconds and
+        profile_<stage>_peak_rss_mb (or profile_<stage>_rss_growth_mb) of all
+        stages.
+        """
+        log = {}
+        for name, stage in self.stages.items():
+            for key, value in stage.items():
+                log[f"profile_{name}_{key}"] = value
+        return log
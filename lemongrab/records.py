@@ -0,0 +1,241 @@
+"""
+Compact in-memory representation of the mobygames companies dataset.
+
+Every production role is a slotted Record which points to a shared Release and Game
+object instead of repeating the game and release information. Platforms, release
+countries and production roles are stored as small integer codes of a Vocabulary
+shared by all records of a dataset.
+
+Records support the item access of the production information dictionaries of the
+dataset files, e.g. record["platform"] or record["release_countries"].
+"""
+
+from .columnar import StringCodes
+
+FIELDS = {
+    "company_name",
+    "game_id",
+    "game_slug",
+    "game_title",
+    "game_years",
+    "production_role",
+    "release_countries",
+    "platform",
+}
+
+
+class Vocabulary:
+    """
+    Integer codes of the platforms, release countries and production roles.
+    """
+
+    def __init__(self, platforms=None, countries=None, production_roles=None):
+        self.platforms = StringCodes(platforms)
+        self.countries = StringCodes(countries)
+        self.production_roles = StringCodes(production_roles)
+
+
+class Game:
+
+    __slots__ = ("game_id", "slug", "title", "years")
+
+    def __init__(self, game_id, slug, title, years):
+        self.game_id = game_id
+        self.slug = slug
+        self.title = title
+        self.years = years
+
+    def __reduce__(self):
+        return Game, (self.game_id, self.slug, self.title, self.years)
+
+
+class Release:
+    """
+    Release of a game on a platform. :platform_code: and :country_codes: are codes of
+    the :vocabulary:.
+    """
+
+    __slots__ = ("game", "platform_code", "country_codes", "vocabulary")
+
+    def __init__(self, game, platform_code, country_codes, vocabulary):
+        self.game = game
+        self.platform_code = platform_code
+        self.country_codes = country_codes
+        self.vocabulary = vocabulary
+
+    def __reduce__(self):
+        return Release, (
+            self.game,
+            self.platform_code,
+            self.country_codes,
+            self.vocabulary,
+        )
+
+
+class Record:
+    """
+    Production role of a company in a release.
+    """
+
+    __slots__ = ("company_id", "company_name", "release", "role_code")
+
+    def __init__(self, company_id, company_name, release, role_code):
+        self.company_id = company_id
+        self.company_name = company_name
+        self.release = release
+        self.role_code = role_code
+
+    def __reduce__(self):
+        return Record, (
+            self.company_id,
+            self.company_name,
+            self.release,
+            self.role_code,
+        )
+
+    @property
+    def game_id(self):
+        return self.release.game.game_id
+
+    @property
+    def game_slug(self):
+        return self.release.game.slug
+
+    @property
+    def game_title(self):
+        return self.release.game.title
+
+    @property
+    def game_years(self):
+        return self.release.game.years
+
+    @property
+    def production_role(self):
+        return self.release.vocabulary.production_roles.values[self.role_code]
+
+    @property
+    def release_countries(self):
+        countries = self.release.vocabulary.countries.values
+        return [countries[code] for code in self.release.country_codes]
+
+    @property
+    def platform(self):
+        return self.release.vocabulary.platforms.values[self.release.platform_code]
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in sorted(FIELDS)}
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == {field: other[field] for field in FIELDS}
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Record({self.to_dict()})"
+
+
+class RecordDataset(dict):
+    """
+    Dictionary company_id -> list of the Records of the company, with the
+    Vocabulary of the records.
+    """
+
+    def __init__(self, vocabulary):
+        super().__init__()
+        self.vocabulary = vocabulary
+
+
+def compact_dataset(rows):
+    """
+    Builds a RecordDataset from (company_id, production information) tuples.
+    Games, releases and company names are created once and shared by all records.
+    """
+    vocabulary = Vocabulary()
+    dataset = RecordDataset(vocabulary)
+    games = {}
+    releases = {}
+    names = {}
+
+    for company_id, info in rows:
+        game_id = info["game_id"]
+        game = games.get(game_id)
+        if game is None:
+            game = Game(
+                game_id, info["game_slug"], info["game_title"], info["game_years"]
+            )
+            games[game_id] = game
+
+        platform_code = vocabulary.platforms(info["platform"])
+        country_codes = tuple(
+            vocabulary.countries(c) for c in info["release_countries"]
+        )
+        release_key = (game_id, platform_code, country_codes)
+        release = releases.get(release_key)
+        if release is None:
+            release = Release(game, platform_code, country_codes, vocabulary)
+            releases[release_key] = release
+
+        company_name = names.setdefault(info["company_name"], info["company_name"])
+        role_code = vocabulary.production_roles(info["production_role"])
+
+        if company_id not in dataset:
+            dataset[company_id] = []
+        dataset[company_id].append(Record(company_id, company_name, release, role_code))
+
+    return dataset
+
+
+def columnar_records(columnar):
+    """
+    Builds a RecordDataset directly from the tables of a ColumnarDataset.
+    """
+    vocabulary = Vocabulary(
+        columnar.platforms, columnar.countries, columnar.production_roles
+    )
+    dataset = RecordDataset(vocabulary)
+
+    games = []
+    offsets = columnar.game_years_offsets
+    for i, (game_id, slug, title) in enumerate(
+        zip(columnar.game_ids, columnar.game_slugs, columnar.game_titles)
+    ):
+        start, end = offsets[i], offsets[i + 1]
+        games.append(
+            Game(game_id, slug, title, columnar.game_years[start:end].tolist())
+        )
+
+    releases = []
+    offsets = columnar.release_countries_offsets
+    for i, (game, platform_code) in enumerate(
+        zip(columnar.release_game, columnar.release_platform)
+    ):
+        start, end = offsets[i], offsets[i + 1]
+        country_codes = tuple(columnar.release_countries[start:end])
+        releases.append(Release(games[game], platform_code, country_codes, vocabulary))
+
+    for company, release, company_name, role_code in zip(
+        columnar.role_company,
+        columnar.role_release,
+        columnar.role_company_name,
+        columnar.role_production_role,
+    ):
+        company_id = columnar.company_ids[company]
+        if company_id not in dataset:
+            dataset[company_id] = []
+        dataset[company_id].append(
+            Record(
+                company_id,
+                columnar.company_names[company_name],
+                releases[release],
+                role_code,
+            )
+        )
+
+    return dataset
@@ -3,14 +3,17 @@ Builds a network of companies based on a tulpa generated
 company sample.
 """
 
-import networkx as nx
+import yaml
 
+from collections import defaultdict
 from .combined_dataset import get_combined_dataset
+from .cooccurrence import cooccurrence
+from .export import export_basename, export_network
+from .network import Network
 from dataclasses import dataclass
-from itertools import combinations
+from .profiling import StageProfiler
 from provit import Provenance
-from .settings import PROV_AGENT, SAMPLE_PROV_ACTIVITY, SAMPLE_PROV_DESC
-from tqdm import tqdm
+from .settings import LOG_FILE_EXT, PROV_AGENT, SAMPLE_PROV_ACTIVITY, SAMPLE_PROV_DESC
 from typing import List
 
 
@@ -40,53 +43,119 @@ def get_wiki_country(c_id, company_dataset, none_return="undefined"):
 
 
 class SampleCompanyNetwork:
-    def __init__(self, game_company_sample):
-        self.company_dataset = get_combined_dataset()
+    """
+    Builds a network of the companies in a tulpa company sample.
+
+    Every company is a single node, its attributes are taken from its last record
+    in the sample. Edges connect companies which worked on the same games and are
+    weighted by the number of shared games. The network is built as node and edge
+    tables (see network.py), the graph attribute returns it as networkx Graph.
+
+    save_network writes a log file with the size of the network. With :profile: the
+    wall time and peak RSS of the build stages are added to the log.
+    """
+
+    def __init__(
+        self,
+        game_company_sample,
+        company_dataset=None,
+        profile=False,
+        log_file_ext=LOG_FILE_EXT,
+    ):
+        self.profiler = StageProfiler(enabled=profile)
+        self.log_file_ext = log_file_ext
+        with self.profiler.stage("load"):
+            if company_dataset is None:
+                company_dataset = get_combined_dataset()
+        self.company_dataset = company_dataset
         self.games = list(game_company_sample.keys())
         self.companies = [Company(**c) for g in game_company_sample.values() for c in g]
-        self.graph = nx.Graph()
+        self.network = Network([])
+        self._graph = None
         self.graph_done = False
-
-    def _filter_games(self, company):
-        games = []
-        for c in self.companies:
-            if c.company_id == company.company_id:
-                games.append(c.game_slug)
-        return games
+        self.shared_games = set()
 
     def build_network(self):
 
+        company_records = {}
+        company_games = defaultdict(set)
         for c in self.companies:
-            c_id = c.company_id
-            self.graph.add_node(c_id)
-            self.graph.nodes[c_id]["role"] = c.role
-            self.graph.nodes[c_id]["platform"] = c.platform
-            self.graph.nodes[c_id]["country"] = get_wiki_country(
-                c_id, self.company_dataset
+            company_records[c.company_id] = c
+            company_games[c.company_id].add(c.game_slug)
+
+        company_ids = list(company_records)
+        records = list(company_records.values())
+        with self.profiler.stage("annotation"):
+            self.network = Network(
+                company_ids,
+                {
+                    "role": [c.role for c in records],
+                    "platform": [c.platform for c in records],
+                    "country": [
+                        get_wiki_country(c_id, self.company_dataset)
+                        for c_id in company_ids
+                    ],
+                    "name": [c.company_name for c in records],
+                },
             )
-            self.graph.nodes[c_id]["name"] = c.company_name
-
-        for c1, c2 in tqdm(combinations(self.companies, 2)):
-            c1_games = set(self._filter_games(c1))
-            c2_games = set(self._filter_games(c2))
-
-            overlap = c1_games.intersection(c2_games)
 
-            if len(overlap):
-                self.graph.add_edge(c1.company_id, c2.company_id, weight=len(overlap))
+        with self.profiler.stage("projection"):
+            weights, self.shared_games = cooccurrence(
+                [company_games[c_id] for c_id in company_ids]
+            )
+            self.network.add_edges(weights)
 
+        self._graph = None
         self.graph_done = True
 
         return self
 
-    def save_network(self, outfilename):
+    @property
+    def graph(self):
+        """
+        The network as networkx Graph, created on first access.
+        """
+        if self._graph is None:
+            self._graph = self.network.to_networkx()
+        return self._graph
+
+    def save_network(self, outfilename, format="graphml", compress=False):
+        """
+        Writes the network in the export :format: (see export.py). The extension of
+        :outfilename: is replaced with the one of the format.
+        """
         if self.graph_done:
-            nx.write_graphml(self.graph, outfilename)
+            with self.profiler.stage("export"):
+                out_files = export_network(
+                    self.network.nodes(),
+                    self.network.edges(),
+                    export_basename(outfilename),
+                    format,
+                    compress,
+                )
         else:
             raise RuntimeError("Graph must be created before it can be saved.")
-        self._write_prov(outfilename)
+        with self.profiler.stage("provenance"):
+            for filename in out_files:
+                self._write_prov(filename)
+        self._write_log(out_files[0])
         return self
 
+    def _write_log(self, outfilename):
+        """
+        Write the size of the network (and the profile) into a logfile.
+        """
+        log = {
+            "sample_games": len(self.games),
+            "nodes": self.network.number_of_nodes(),
+            "edges": self.network.number_of_edges(),
+            "games": len(self.shared_games),
+        }
+        log.update(self.profiler.log())
+
+        with open(f"{outfilename}_log.{self.log_file_ext}", "w") as outfile:
+            yaml.dump(log, outfile)
+
     def _write_prov(self, outfilename):
         prov = Provenance(outfilename)
         prov.add(
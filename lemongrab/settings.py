@@ -5,17 +5,33 @@ from pathlib import Path
 
 DIGGR_API = os.environ.get("DIGGR_API", "http://127.0.0.1:6660")
 LOG_FILE_EXT = "yaml"
+NETWORK_STATE_EXT = "state"
+BUILD_WORKERS = 8
+DIGGR_API_CACHE_TTL = 7 * 24 * 60 * 60
+DIGGR_API_CACHE_SIZE = 4 * 2**30
+DIGGR_API_POOL_SIZE = 10
+DIGGR_API_KEEP_ALIVE = True
+DIGGR_API_GZIP = True
+DIGGR_API_BULK = False
+DIGGR_API_BULK_SIZE = 100
 
 DATASETS_DIR = "lemongrab_datasets"
 COMPANY_NETWORKS_DIR = "company_networks"
 WIKIDATA_MAPPING_FILENAME = "wikidata_mapping.json"
 MOBYGAMES_COMPANIES_FILENAME = "mobygames_companies.json"
+MOBYGAMES_COMPANIES_JSONL_FILENAME = "mobygames_companies.jsonl"
+MOBYGAMES_COMPANIES_COLUMNAR_FILENAME = "mobygames_companies.columnar"
+COMBINED_DATASET_SNAPSHOT_FILENAME = "combined_dataset.snapshot"
+DIGGR_API_CACHE_FILENAME = "diggr_api_cache.sqlite"
+MOBYGAMES_COMPANIES_JOURNAL_FILENAME = "mobygames_companies.journal"
+MOBYGAMES_COMPANIES_PROCESSED_FILENAME = "mobygames_companies_processed.json"
 ID_2_SLUG_FILENAME = "mobygames_companies_id_to_slug.json"
 
 BASE_PATH = Path(__file__).resolve().parent
 ID_2_SLUG_PATH = BASE_PATH / "datasets" / ID_2_SLUG_FILENAME
 
-SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+SPARQL_ENDPOINT = os.environ.get("SPARQL_ENDPOINT", "https://query.wikidata.org/sparql")
+SPARQL_PAGE_SIZE = 10000
 SPARQL_AGENT = "lemongrab of diggr.link"
 SPARQL_QUERY = """
 SELECT ?item ?itemLabel ?countryLabel ?companyId
@@ -26,8 +42,10 @@ SELECT ?item ?itemLabel ?countryLabel ?companyId
 }
 """
 
-BROWSER_DEBUG = True
+BROWSER_DEBUG = False
 BROWSER_PORT = 8228
+BROWSER_CACHE_SIZE = 32
+BROWSER_WORKERS = 1
 
 
 PROV_AGENT = "lemongrab"
@@ -40,6 +58,10 @@ COMPANIES_PROV_ACTIVITY = "build_companies_dataset"
 COMPANIES_PROV_DESC = """Dataset containing all companies in mobygames and their corresponding \
 game/release information"""
 
+COLUMNAR_PROV_ACTIVITY = "convert_companies_dataset"
+COLUMNAR_PROV_DESC = """Columnar version of the mobygames companies dataset with separate game, \
+release, company and production role tables"""
+
 NETWORK_PROV_ACTIVITY = "build_company_network"
 NETWORK_PROV_DESC = """Company graph containing all companies for platforms {platforms} and \
 release countries {countries}"""
@@ -2,13 +2,17 @@ import csv
 import json
 import yaml
 
+from .columnar import ColumnarDataset
+from .records import columnar_records, compact_dataset
 from pathlib import Path
 from .settings import (
     COMPANY_NETWORKS_DIR,
     DATASETS_DIR,
     LOG_FILE_EXT,
     ID_2_SLUG_FILENAME,
+    MOBYGAMES_COMPANIES_COLUMNAR_FILENAME,
     MOBYGAMES_COMPANIES_FILENAME,
+    MOBYGAMES_COMPANIES_JSONL_FILENAME,
     WIKIDATA_MAPPING_FILENAME,
 )
 
@@ -24,16 +28,103 @@ def read_json(infilename):
         return json.load(infile)
 
 
+def read_jsonl(infilename):
+    """
+    Yields the JSON objects of a JSON Lines file one by one.
+    """
+    with open(infilename) as infile:
+        for line in infile:
+            yield json.loads(line)
+
+
 def read_yaml(infilename):
     with open(infilename) as infile:
         return yaml.safe_load(infile)
 
 
+def mobygames_companies_path(datasets_dir=DATASETS_DIR):
+    """
+    Returns the path of the mobygames companies dataset. If the dataset is available
+    in several formats (JSON, JSON Lines, columnar), the most recently built file is
+    used.
+    """
+    candidates = [
+        Path(datasets_dir) / filename
+        for filename in (
+            MOBYGAMES_COMPANIES_FILENAME,
+            MOBYGAMES_COMPANIES_JSONL_FILENAME,
+            MOBYGAMES_COMPANIES_COLUMNAR_FILENAME,
+        )
+    ]
+    existing = [path for path in candidates if path.exists()]
+    if not existing:
+        return candidates[0]
+    return max(existing, key=lambda path: path.stat().st_mtime)
+
+
+def datasets_signature(datasets_dir=DATASETS_DIR):
+    """
+    Returns the path, modification time and size of all dataset files.
+    The signature changes whenever one of the datasets is rebuilt.
+    """
+    paths = [
+        mobygames_companies_path(datasets_dir),
+        Path(datasets_dir) / ID_2_SLUG_FILENAME,
+        Path(datasets_dir) / WIKIDATA_MAPPING_FILENAME,
+    ]
+    signature = []
+    for path in paths:
+        if path.exists():
+            stat = path.stat()
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def read_mobygames_companies(infilename):
+    """
+    Reads a mobygames companies dataset from a JSON, a JSON Lines or a columnar file.
+    JSON Lines are read record by record into the company dictionary. Company ids
+    are strings in every format (older JSON Lines files have integer ids).
+    """
+    suffix = Path(infilename).suffix
+    if suffix == ".columnar":
+        return ColumnarDataset.load(infilename).to_mobygames_companies()
+    if suffix != ".jsonl":
+        return read_json(infilename)
+
+    mobygames_companies = {}
+    for record in read_jsonl(infilename):
+        company_id = str(record.pop("company_id"))
+        mobygames_companies.setdefault(company_id, []).append(record)
+    return mobygames_companies
+
+
+def read_mobygames_records(infilename):
+    """
+    Reads a mobygames companies dataset into a compact RecordDataset. Columnar and
+    JSON Lines files are converted without building the production information
+    dictionaries of the whole dataset.
+    """
+    suffix = Path(infilename).suffix
+    if suffix == ".columnar":
+        return columnar_records(ColumnarDataset.load(infilename))
+    if suffix == ".jsonl":
+        return compact_dataset(
+            (str(record.pop("company_id")), record) for record in read_jsonl(infilename)
+        )
+    return compact_dataset(
+        (company_id, info)
+        for company_id, infos in read_json(infilename).items()
+        for info in infos
+    )
+
+
 def get_datasets():
     """
-    Opens dataset files and returns their contents.
+    Opens dataset files and returns their contents. The mobygames companies dataset
+    is returned as compact RecordDataset.
     """
-    mobygames_companies = read_json(Path(DATASETS_DIR) / MOBYGAMES_COMPANIES_FILENAME)
+    mobygames_companies = read_mobygames_records(mobygames_companies_path())
     id_2_slug = read_json(Path(DATASETS_DIR) / ID_2_SLUG_FILENAME)
     wikidata_mapping = read_json(Path(DATASETS_DIR) / WIKIDATA_MAPPING_FILENAME)
     return mobygames_companies, id_2_slug, wikidata_mapping
@@ -56,20 +147,30 @@ def build_aggregated_logs(
 ):
     """
     Aggregates all logs from the company_networks directory into a single csv.
+    The columns are the union of the entries of all logs (e.g. profiling entries
+    or the entries of sample network logs), missing entries are left empty.
     """
     cn_path = Path(company_networks_dir)
     used_logs = []
+    logs = []
+    fieldnames = {}
+    for logfilename in cn_path.glob(f"*.{log_file_ext}"):
+        log = read_yaml(logfilename)
+        if isinstance(log.get("countries"), list):
+            log["countries"] = ", ".join(log["countries"])
+        fieldnames.update(dict.fromkeys(log))
+        logs.append(log)
+        used_logs.append(logfilename)
+
     with open(outfilename, "w", newline="") as csvfile:
-        logwriter_csv = csv.writer(
-            csvfile, delimiter=";", quotechar='"', quoting=csv.QUOTE_MINIMAL
+        logwriter_csv = csv.DictWriter(
+            csvfile,
+            fieldnames=list(fieldnames),
+            delimiter=";",
+            quotechar='"',
+            quoting=csv.QUOTE_MINIMAL,
         )
-        header_written = False
-        for logfilename in cn_path.glob(f"*.{log_file_ext}"):
-            log = read_yaml(logfilename)
-            if not header_written:
-                logwriter_csv.writerow(list(log.keys()))
-                header_written = True
-            log["countries"] = ", ".join(log["countries"])
-            logwriter_csv.writerow(list(log.values()))
-            used_logs.append(logfilename)
+        if logs:
+            logwriter_csv.writeheader()
+        logwriter_csv.writerows(logs)
     return outfilename, used_logs
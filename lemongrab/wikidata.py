@@ -1,4 +1,6 @@
 import json
+import os
+import textwrap
 
 from SPARQLWrapper import SPARQLWrapper, JSON
 from pathlib import Path
@@ -6,6 +8,7 @@ from provit import Provenance
 from .settings import (
     DATASETS_DIR,
     SPARQL_ENDPOINT,
+    SPARQL_PAGE_SIZE,
     SPARQL_QUERY,
     SPARQL_AGENT,
     PROV_AGENT,
@@ -16,39 +19,138 @@ from .settings import (
 from urllib.error import URLError
 
 
-def build_wikidata_mapping():
+def paged_query(page_size, offset):
     """
-    Fetches all wikidata items with a mobygames company ID.
-    Result is saved as JSON to DATASETS_DIR / WIKIDATA_MAPPING_FILENAME.
+    Returns the SPARQL query for the page of :page_size: results at :offset:.
+    The results are ordered, so the pages do not overlap.
+    """
+    return (
+        SPARQL_QUERY.rstrip()
+        + f"\nORDER BY ?companyId ?item ?country\nLIMIT {page_size}\nOFFSET {offset}\n"
+    )
+
+
+def mapping_entry(binding):
+    """
+    Returns the wikidata mapping entry of a SPARQL result binding.
     """
-    sparql = SPARQLWrapper(SPARQL_ENDPOINT, agent=SPARQL_AGENT,)
+    country = None
+    if "countryLabel" in binding:
+        country = binding["countryLabel"]["value"]
+
+    return {
+        "mobygames_slug": binding["companyId"]["value"],
+        "country": country,
+        "wkp": binding["item"]["value"].split("/")[-1],
+    }
 
-    sparql.setQuery(SPARQL_QUERY)
+
+def fetch_wikidata_mapping(endpoint=SPARQL_ENDPOINT, page_size=SPARQL_PAGE_SIZE):
+    """
+    Yields the wikidata mapping entries page by page. Each page is fetched with a
+    LIMIT/OFFSET query of :page_size: results. Without :page_size: all entries are
+    fetched with a single query.
+    """
+    sparql = SPARQLWrapper(endpoint, agent=SPARQL_AGENT,)
     sparql.setReturnFormat(JSON)
+
+    offset = 0
+    while True:
+        if page_size:
+            sparql.setQuery(paged_query(page_size, offset))
+        else:
+            sparql.setQuery(SPARQL_QUERY)
+        try:
+            results = sparql.query().convert()
+        except URLError:
+            raise RuntimeError(
+                "Error while fetching data from wikidata... No file written!"
+            )
+
+        bindings = results["results"]["bindings"]
+        yield [mapping_entry(binding) for binding in bindings]
+        if not page_size or len(bindings) < page_size:
+            return
+        offset += page_size
+
+
+def write_mapping(entries, mapping_filename):
+    """
+    Streams the :entries: into a JSON list file. The file is written to a temporary
+    file first, so the old mapping stays intact if fetching fails.
+    """
+    tmp_filename = Path(f"{mapping_filename}.tmp")
+    n_entries = 0
     try:
-        results = sparql.query().convert()
-    except URLError:
-        raise RuntimeError(
-            "Error while fetching data from wikidata... No file written!"
-        )
+        with open(tmp_filename, "w") as f:
+            f.write("[")
+            for entry in entries:
+                f.write(",\n" if n_entries else "\n")
+                f.write(textwrap.indent(json.dumps(entry, indent=4), "    "))
+                n_entries += 1
+            f.write("\n]" if n_entries else "]")
+        os.replace(tmp_filename, mapping_filename)
+    finally:
+        if tmp_filename.exists():
+            tmp_filename.unlink()
+    return n_entries
 
-    dataset = []
-    for binding in results["results"]["bindings"]:
-        country = None
-        if "countryLabel" in binding:
-            country = binding["countryLabel"]["value"]
-
-        dataset.append(
-            {
-                "mobygames_slug": binding["companyId"]["value"],
-                "country": country,
-                "wkp": binding["item"]["value"].split("/")[-1],
-            }
-        )
 
+def _row(entry):
+    return (entry["mobygames_slug"], entry["country"], entry["wkp"])
+
+
+def diff_mapping(old_entries, new_entries):
+    """
+    Compares two wikidata mappings. Returns the entries only in the new mapping
+    (added) and the entries only in the old mapping (removed).
+    """
+    old_rows = {_row(entry) for entry in old_entries}
+    new_rows = {_row(entry) for entry in new_entries}
+    added = [entry for entry in new_entries if _row(entry) not in old_rows]
+    removed = [entry for entry in old_entries if _row(entry) not in new_rows]
+    return added, removed
+
+
+def apply_diff(old_entries, added, removed):
+    """
+    Returns the old mapping without the :removed: and with the :added: entries.
+    Unchanged entries keep their position.
+    """
+    removed_rows = {_row(entry) for entry in removed}
+    return [e for e in old_entries if _row(e) not in removed_rows] + added
+
+
+def build_wikidata_mapping(
+    endpoint=SPARQL_ENDPOINT, page_size=SPARQL_PAGE_SIZE, diff=False
+):
+    """
+    Fetches all wikidata items with a mobygames company ID.
+    Result is saved as JSON to DATASETS_DIR / WIKIDATA_MAPPING_FILENAME.
+
+    The results are fetched in pages of :page_size: and streamed to the file.
+    With :diff: the changes to the existing mapping are applied instead and the
+    file is only rewritten if there are any.
+
+    Returns the number of entries, the mapping filename and the (added, removed)
+    entries in diff mode (otherwise None).
+    """
     mapping_filename = Path(DATASETS_DIR) / WIKIDATA_MAPPING_FILENAME
-    with open(mapping_filename, "w") as f:
-        json.dump(dataset, f, indent=4)
+    pages = fetch_wikidata_mapping(endpoint, page_size)
+
+    changes = None
+    if diff and mapping_filename.exists():
+        with open(mapping_filename) as f:
+            old_entries = json.load(f)
+        new_entries = [entry for page in pages for entry in page]
+        changes = diff_mapping(old_entries, new_entries)
+        if not any(changes):
+            return len(old_entries), mapping_filename, changes
+        n_entries = write_mapping(apply_diff(old_entries, *changes), mapping_filename)
+    else:
+        n_entries = write_mapping(
+            (entry for page in pages for entry in page), mapping_filename
+        )
 
     prov = Provenance(mapping_filename, overwrite=True)
     prov.add(
@@ -59,4 +161,4 @@ def build_wikidata_mapping():
     prov.add_primary_source("wikidata")
     prov.save()
 
-    return len(dataset), mapping_filename
+    return n_entries, mapping_filename, changes
@@ -1,6 +1,9 @@
 import os
 import pytest
+import random
+import threading
 
+from http.server import HTTPServer
 from pathlib import Path
 
 @pytest.fixture()
@@ -9,3 +12,68 @@ def clean_cwd(tmp_path):
     os.chdir(tmp_path)
     yield
     os.chdir(old_cwd)
+
+
+@pytest.fixture()
+def http_server():
+    """
+    Starts local HTTP servers: http_server(handler) serves the request :handler:
+    class in a thread and returns the server. Its requests list is meant for the
+    handler to record the requests.
+    """
+    servers = []
+
+    def start(handler):
+        server = HTTPServer(("127.0.0.1", 0), handler)
+        server.requests = []
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+PLATFORMS = ["DOS", "Sony PlayStation", "Game Boy", None]
+COUNTRIES = ["Japan", "Germany", "Sweden", "United States", ""]
+ROLES = ["Developed by", "Published by", "Ported by"]
+
+
+def random_dataset(n_companies=40, n_games=60, seed=1):
+    rnd = random.Random(seed)
+    games = [
+        (str(i), f"game-{i}", rnd.choice(PLATFORMS), rnd.sample(COUNTRIES, 2))
+        for i in range(n_games)
+    ]
+    mobygames_companies = {}
+    for company_id in map(str, range(n_companies)):
+        mobygames_companies[company_id] = [
+            {
+                "company_name": f"Company {company_id}",
+                "game_id": game_id,
+                "game_slug": slug,
+                "game_title": slug.title(),
+                "game_years": [1995],
+                "production_role": rnd.choice(ROLES),
+                "release_countries": countries,
+                "platform": platform,
+            }
+            for game_id, slug, platform, countries in rnd.sample(games, 8)
+        ]
+    id_2_slug = [{"company_id": str(i), "slug": f"c-{i}"} for i in range(n_companies)]
+    wikidata_mapping = [
+        {"mobygames_slug": f"c-{i}", "country": "Japan" if i % 2 else None}
+        for i in range(n_companies)
+    ]
+    return mobygames_companies, id_2_slug, wikidata_mapping
+
+
+@pytest.fixture()
+def company_datasets():
+    """
+    Small random mobygames companies, id to slug and wikidata mapping datasets.
+    """
+    return random_dataset()
@@ -0,0 +1,27 @@
+from lemongrab.backbone import node_strengths, prune_weights
+
+WEIGHTS = {(0, 1): 10, (0, 2): 1, (0, 3): 1, (1, 2): 1, (2, 3): 3}
+
+
+def test_node_strengths():
+    strengths, degrees = node_strengths(WEIGHTS, 5)
+
+    assert list(strengths) == [12, 11, 5, 4, 0]
+    assert list(degrees) == [3, 2, 3, 2, 0]
+
+
+def test_min_weight():
+    assert prune_weights(WEIGHTS, 5) == WEIGHTS
+    assert prune_weights(WEIGHTS, 5, min_weight=3) == {(0, 1): 10, (2, 3): 3}
+
+
+def test_disparity_backbone():
+    # (0, 1) carries most of the strength of node 0, (2, 3) most of node 3
+    assert prune_weights(WEIGHTS, 5, alpha=0.3) == {(0, 1): 10, (2, 3): 3}
+    assert prune_weights(WEIGHTS, 5, alpha=0.05) == {(0, 1): 10}
+    assert prune_weights(WEIGHTS, 5, alpha=1) == WEIGHTS
+
+
+def test_disparity_backbone_after_min_weight():
+    # without the light edges, the degrees are 1 and no edge is significant
+    assert prune_weights(WEIGHTS, 5, min_weight=3, alpha=0.05) == {}
@@ -0,0 +1,63 @@
+import pytest
+
+from lemongrab.batch import group_jobs, read_batch_spec
+from lemongrab.combined_dataset import CombinedDataset
+from lemongrab.company_network import CompanyNetworkBuilder
+
+SPEC_YAML = """
+jobs:
+  - countries: [Japan, Sweden]
+    platform: DOS
+  - countries: [Sweden, Japan]
+    platform: DOS
+    roles: true
+  - gamelist: gamelist.yml
+"""
+
+SPEC_CSV = """countries,platform,roles,publisher,gamelist
+Japan;Sweden,DOS,,,
+Sweden; Japan,DOS,true,,
+,,,,gamelist.yml
+"""
+
+
+@pytest.mark.parametrize(
+    "filename,spec", [("spec.yml", SPEC_YAML), ("spec.csv", SPEC_CSV)]
+)
+def test_read_batch_spec(tmp_path, filename, spec):
+    (tmp_path / filename).write_text(spec)
+    jobs = read_batch_spec(tmp_path / filename)
+
+    assert jobs[1] == {
+        "countries": ("Sweden", "Japan"),
+        "platform": "DOS",
+        "roles": True,
+        "publisher": False,
+        "gamelist": None,
+    }
+    assert jobs[2]["gamelist"] == "gamelist.yml"
+    assert [[i for i, _ in group] for group in group_jobs(jobs)] == [[0, 1], [2]]
+
+
+def test_read_batch_spec_unknown_field(tmp_path):
+    (tmp_path / "spec.yml").write_text("- country: Japan\n")
+    with pytest.raises(ValueError):
+        read_batch_spec(tmp_path / "spec.yml")
+
+
+def test_shared_filter(company_datasets):
+    dataset = CombinedDataset(*company_datasets)
+    first = CompanyNetworkBuilder(countries=("Japan",), platform="DOS", dataset=dataset)
+    first.build_network()
+    shared = CompanyNetworkBuilder(
+        countries=("Japan",), platform="DOS", roles=True, dataset=dataset
+    )
+    network, _ = shared.build_network(apply_filter=False)
+
+    dataset.set_filter([], [])
+    fresh = CompanyNetworkBuilder(
+        countries=("Japan",), platform="DOS", roles=True, dataset=dataset
+    )
+    expected, _ = fresh.build_network()
+    assert dict(network.nodes()) == dict(expected.nodes())
+    assert sorted(network.edges()) == sorted(expected.edges())
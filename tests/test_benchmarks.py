@@ -0,0 +1,27 @@
+from benchmarks.datagen import synthetic_datasets, synthetic_sample
+from benchmarks.run import compare, run_size
+
+
+def test_synthetic_datasets():
+    mobygames_companies, id_2_slug, wikidata_mapping = synthetic_datasets(
+        n_companies=20, n_games=30, releases_per_game=2, roles_per_release=3
+    )
+    assert sum(len(infos) for infos in mobygames_companies.values()) == 30 * 2 * 3
+    assert len(id_2_slug) == len(wikidata_mapping) == 20
+
+    sample = synthetic_sample(mobygames_companies, 5)
+    assert len(sample) == 5
+
+
+def test_run_size_and_compare():
+    results = run_size(
+        "tiny",
+        {"n_companies": 10, "n_games": 20},
+        repeat=1,
+        selected=["set_filter", "get_overview"],
+    )
+    assert [r["benchmark"] for r in results] == ["set_filter", "get_overview"]
+    assert compare(results, results, 0, 0) == []
+
+    faster = [dict(r, seconds=r["seconds"] / 10 - 1) for r in results]
+    assert len(compare(results, faster, 0.25, 0.1)) == 2
@@ -0,0 +1,224 @@
+import json
+import multiprocessing
+import pytest
+import socket
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from lemongrab import browser
+from lemongrab.utils import read_json, write_json
+from pathlib import Path
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+FILTERS = [
+    {"platform_dropdown": ["DOS"], "country_dropdown": []},
+    {"platform_dropdown": ["Game Boy"], "country_dropdown": ["Japan"]},
+    {"platform_dropdown": [], "country_dropdown": ["Sweden", "Germany"]},
+]
+
+
+@pytest.fixture()
+def datasets_dir(clean_cwd, company_datasets):
+    datasets_dir = Path("lemongrab_datasets")
+    datasets_dir.mkdir()
+    filenames = [
+        "mobygames_companies.json",
+        "mobygames_companies_id_to_slug.json",
+        "wikidata_mapping.json",
+    ]
+    for filename, data in zip(filenames, company_datasets):
+        write_json(data, datasets_dir / filename)
+    browser.dataset = None
+    yield datasets_dir
+    browser.dataset = None
+
+
+def companies_query(filter_):
+    return "/api/companies?" + urlencode({"length": -1, "filter": json.dumps(filter_)})
+
+
+def test_concurrent_requests(datasets_dir):
+    client = browser.app.test_client()
+    expected = [client.get(companies_query(f)).get_json() for f in FILTERS]
+    browser.filtered_overview.cache_clear()
+
+    def fetch(i):
+        return i, client.get(companies_query(FILTERS[i % len(FILTERS)])).get_json()
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        for i, data in executor.map(fetch, range(30)):
+            assert data == expected[i % len(FILTERS)]
+
+
+def test_overview_cache_normalizes_filters(datasets_dir):
+    browser.filtered_overview.cache_clear()
+
+    first = browser.get_overview(["DOS", "Game Boy"], ["Japan"], "")
+    second = browser.get_overview(["Game Boy", "DOS", "DOS"], ["Japan", "Japan"], "")
+
+    assert second is first
+    info = browser.filtered_overview.cache_info()
+    assert (info.currsize, info.hits, info.misses) == (1, 1, 1)
+
+
+def test_overview_cache_gamelist(datasets_dir):
+    with open("gamelist.yml", "w") as f:
+        f.write("Game 1:\n  mobygames: [game-7, game-1]\n")
+    browser.filtered_overview.cache_clear()
+
+    unfiltered = browser.get_overview([], [], "")
+    gamelist = browser.get_overview([], [], "gamelist.yml")
+
+    assert gamelist is not unfiltered
+    assert set(gamelist["games_table"]) == {"game-1", "game-7"}
+    assert browser.get_overview([], [], "gamelist.yml") is gamelist
+    info = browser.filtered_overview.cache_info()
+    assert (info.currsize, info.hits) == (2, 1)
+
+
+def test_changed_datasets_are_reloaded(datasets_dir):
+    old_dataset = browser.get_dataset()
+    old_signature = browser.dataset_signature
+    old_overview = browser.get_overview([], [], "")
+    assert browser.filtered_overview.cache_info().currsize == 1
+
+    wikidata_mapping = read_json(datasets_dir / "wikidata_mapping.json")
+    for company in wikidata_mapping:
+        company["country"] = "Sweden"
+    write_json(wikidata_mapping, datasets_dir / "wikidata_mapping.json")
+    dataset = browser.get_dataset()
+
+    assert dataset is not old_dataset
+    assert browser.dataset_signature != old_signature
+    assert browser.filtered_overview.cache_info().currsize == 0
+
+    # a request which started on the old dataset and finishes after the reload
+    browser.filtered_overview(old_dataset, (), (), None)
+    overview = browser.get_overview([], [], "")
+
+    assert overview is not old_overview
+    assert [country for country, n in overview["company_countries"]] == ["Sweden"]
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="requires fork"
+)
+def test_serve_workers(datasets_dir):
+    client = browser.app.test_client()
+    expected = client.get(companies_query(FILTERS[0])).get_json()
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    context = multiprocessing.get_context("fork")
+    backend = context.Process(target=browser.serve_workers, args=(2, port))
+    backend.start()
+    try:
+        url = f"http://127.0.0.1:{port}" + companies_query(FILTERS[0])
+        for _ in range(50):
+            try:
+                with urlopen(url) as rsp:
+                    data = json.load(rsp)
+                break
+            except URLError:
+                time.sleep(0.1)
+        assert data == expected
+    finally:
+        backend.terminate()
+        backend.join()
+    assert multiprocessing.active_children() == []
+
+
+def test_games_csv_is_streamed(datasets_dir, monkeypatch):
+    monkeypatch.setattr(browser, "CSV_CHUNK_ROWS", 5)
+    client = browser.app.test_client()
+    filter_ = json.dumps(FILTERS[0])
+    games = client.get(
+        "/api/games?" + urlencode({"length": -1, "filter": filter_})
+    ).get_json()
+
+    rsp = client.get("/api/games.csv?" + urlencode({"filter": filter_}))
+
+    assert rsp.is_streamed
+    lines = rsp.get_data(as_text=True).splitlines()
+    assert lines[0] == ",".join(browser.GAMES_COLUMNS)
+    assert len(lines) == 1 + games["recordsTotal"]
+
+
+def api_query(client, table, **values):
+    return client.get(f"/api/{table}?" + urlencode(values)).get_json()
+
+
+def test_api_paging(datasets_dir):
+    client = browser.app.test_client()
+    rows = api_query(client, "companies", length=-1)["data"]
+
+    page = api_query(client, "companies", start=5, length=10, draw=3)
+
+    assert page["draw"] == 3
+    assert page["data"] == rows[5:15]
+    assert page["recordsTotal"] == page["recordsFiltered"] == len(rows)
+    assert api_query(client, "companies", start=35, length=10)["data"] == rows[35:]
+    assert len(api_query(client, "games")["data"]) == 10
+
+
+def test_api_search(datasets_dir):
+    client = browser.app.test_client()
+    n_games = api_query(client, "games", length=0)["recordsTotal"]
+
+    page = api_query(client, "games", length=-1, **{"search[value]": "COMPANY 1"})
+
+    assert page["recordsTotal"] == n_games
+    assert 0 < page["recordsFiltered"] < n_games
+    assert len(page["data"]) == page["recordsFiltered"]
+    assert all("company 1" in row["company_name"].lower() for row in page["data"])
+
+
+@pytest.mark.parametrize("table", ["games", "companies"])
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_api_order(datasets_dir, table, direction):
+    client = browser.app.test_client()
+    columns = browser.GAMES_COLUMNS if table == "games" else browser.COMPANIES_COLUMNS
+    rows = api_query(client, table, length=-1)["data"]
+
+    for i, column in enumerate(columns):
+        order = {"order[0][column]": i, "order[0][dir]": direction}
+        page = api_query(client, table, length=-1, **order)
+
+        assert page["data"] == sorted(
+            rows, key=lambda row: row[column], reverse=direction == "desc"
+        )
+
+
+@pytest.mark.parametrize("filter_", FILTERS)
+def test_api_filter(datasets_dir, filter_):
+    client = browser.app.test_client()
+    overview = browser.get_overview(
+        filter_["platform_dropdown"], filter_["country_dropdown"], ""
+    )
+    unfiltered = api_query(client, "games", length=-1)
+
+    games = api_query(client, "games", length=-1, filter=json.dumps(filter_))
+    companies = api_query(client, "companies", length=-1, filter=json.dumps(filter_))
+
+    assert games["data"] == overview["games_rows"]
+    assert games["recordsTotal"] < unfiltered["recordsTotal"]
+    assert companies["data"] == overview["companies_rows"]
+
+
+@pytest.mark.parametrize("dev", [False, True])
+def test_debugger_only_in_dev_mode(monkeypatch, dev):
+    calls = []
+    monkeypatch.setattr(browser.app, "run", lambda **kwargs: calls.append(kwargs))
+    monkeypatch.setattr(browser, "serve_workers", lambda workers: calls.append(workers))
+
+    browser.start_backend(workers=1, dev=dev)
+    browser.start_backend(workers=4, dev=dev)
+
+    if dev:
+        assert [call["debug"] for call in calls] == [True, True]
+    else:
+        assert calls[0]["debug"] is False
+        assert calls[1] == 4
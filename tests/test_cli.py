@@ -1,10 +1,40 @@
 import click
 import os
+import subprocess
+import sys
+import time
 
 from click.testing import CliRunner
 from lemongrab.cli import cli
 
+HEAVY_MODULES = [
+    "flask",
+    "networkx",
+    "SPARQLWrapper",
+    "diggrtoolbox",
+    "provit",
+    "requests",
+    "lemongrab.browser",
+]
+
 def test_init(clean_cwd):
     runner = CliRunner()
-    result = runner.invoke(cli, ["init", "test"])
+    result = runner.invoke(cli, ["init"])
     assert result.exit_code == 0
+
+def test_cli_import_is_lightweight():
+    code = "import sys, lemongrab.cli; print(' '.join(sorted(sys.modules)))"
+    modules = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout.split()
+    assert not set(HEAVY_MODULES) & set(modules)
+
+def test_cli_startup_time():
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", "from lemongrab.cli import cli; cli()", "--help"],
+        check=True,
+        capture_output=True,
+    )
+    startup_time = time.perf_counter() - start
+    assert startup_time < 2
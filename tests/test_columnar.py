@@ -0,0 +1,34 @@
+from lemongrab.columnar import ColumnarDataset
+
+
+def production_info(game_id, role, platform, countries):
+    return {
+        "company_name": "Company",
+        "game_id": game_id,
+        "game_slug": f"game-{game_id}",
+        "game_title": f"Game {game_id}",
+        "game_years": [1996, 1997],
+        "production_role": role,
+        "release_countries": countries,
+        "platform": platform,
+    }
+
+
+def test_columnar_roundtrip(tmp_path):
+    mobygames_companies = {
+        "1": [
+            production_info("672", "Published by", "Sony PlayStation", ["Sweden"]),
+            production_info("672", "Published by", "DOS", ["Sweden", "Italy"]),
+        ],
+        "2": [
+            production_info("672", "Developed by", "Sony PlayStation", ["Sweden"]),
+            production_info("673", "Developed by", None, []),
+        ],
+    }
+    outfilename = tmp_path / "mobygames_companies.columnar"
+    ColumnarDataset.from_mobygames_companies(mobygames_companies).save(outfilename)
+
+    columnar = ColumnarDataset.load(outfilename)
+    assert columnar.to_mobygames_companies() == mobygames_companies
+    assert len(columnar.game_ids) == 2
+    assert len(columnar.release_game) == 3
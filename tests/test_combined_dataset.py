@@ -0,0 +1,187 @@
+import pytest
+
+from collections import Counter, defaultdict
+from lemongrab import combined_dataset
+from lemongrab.combined_dataset import CombinedDataset, get_combined_dataset
+from lemongrab.utils import write_json
+from pathlib import Path
+
+
+def scan_filter(mobygames_companies, platforms, countries):
+    filtered = {}
+    for company_id, games in mobygames_companies.items():
+        games = [
+            game
+            for game in games
+            if (game["platform"] in platforms or not platforms)
+            and (not countries or set(countries) & set(game["release_countries"]))
+        ]
+        if games:
+            filtered[company_id] = games
+    return filtered
+
+
+def scan_overview(mobygames_companies, id_2_slug, wikidata_mapping, filtered):
+    """
+    The overview of the :filtered: production information dictionaries as
+    computed by the original scan over all games of all companies.
+    """
+    slug_map = {x["company_id"]: x["slug"] for x in id_2_slug}
+    country_map = {
+        x["mobygames_slug"]: x["country"] for x in wikidata_mapping if x["country"]
+    }
+    production_roles = Counter()
+    companies_games = defaultdict(set)
+    games_dataset = defaultdict(list)
+    for company_id, games in filtered.items():
+        company_country = country_map.get(slug_map[company_id], "")
+        for game in games:
+            companies_games[company_id].add(game["game_slug"])
+            production_roles[game["production_role"]] += 1
+            games_dataset[game["game_slug"]].append(
+                {
+                    "game_title": game["game_title"],
+                    "company_name": game["company_name"],
+                    "company_country": company_country,
+                    "production_role": game["production_role"],
+                }
+            )
+
+    companies = Counter(
+        {
+            mobygames_companies[x][0]["company_name"]: len(y)
+            for x, y in companies_games.items()
+        }
+    )
+    countries_acc = defaultdict(set)
+    companies_with_country = 0
+    for company_id in companies_games:
+        slug = slug_map.get(company_id)
+        if slug in country_map:
+            companies_with_country += 1
+            countries_acc[country_map[slug]].add(
+                mobygames_companies[company_id][0]["company_name"]
+            )
+    countries_accumulated = Counter({x: len(y) for x, y in countries_acc.items()})
+
+    return {
+        "companies": companies,
+        "companies_most_common": list(companies.most_common(30)),
+        "company_games": dict(companies_games),
+        "company_countries": list(countries_accumulated.most_common(200)),
+        "companies_with_country": companies_with_country,
+        "production_roles": list(production_roles.most_common(50)),
+        "games_table": dict(games_dataset),
+    }
+
+
+def scan_gamelist_filter(mobygames_companies, gamelist):
+    filtered = {}
+    for company_id, games in mobygames_companies.items():
+        games = [game for game in games if game["game_slug"] in gamelist]
+        if games:
+            filtered[company_id] = games
+    return filtered
+
+
+@pytest.mark.parametrize(
+    "platforms, countries, gamelist",
+    [
+        ([], [], None),
+        (["DOS"], [], None),
+        ([None], ["Japan"], None),
+        ([], ["Sweden", "Japan"], None),
+        (["DOS", "Game Boy"], ["Germany"], None),
+        (["Atari 2600"], [], None),
+        ([], [], ["game-1", "game-7", "game-unknown"]),
+        ([], [], []),
+    ],
+)
+def test_get_overview_matches_scan(company_datasets, platforms, countries, gamelist):
+    mobygames_companies = company_datasets[0]
+    dataset = CombinedDataset(*company_datasets)
+    if gamelist is None:
+        overview = dataset.get_overview(dataset.filter(platforms, countries))
+        filtered = scan_filter(mobygames_companies, platforms, countries)
+    else:
+        overview = dataset.get_overview(dataset.gamelist_filter(gamelist))
+        filtered = scan_gamelist_filter(mobygames_companies, gamelist)
+
+    expected = scan_overview(*company_datasets, filtered)
+
+    assert overview == expected
+    assert list(overview["companies"].items()) == list(expected["companies"].items())
+    assert list(overview["games_table"].items()) == list(
+        expected["games_table"].items()
+    )
+
+
+def test_set_filter_matches_scan(company_datasets):
+    dataset = CombinedDataset(*company_datasets)
+    for platforms, countries in [
+        ([], []),
+        (["DOS"], []),
+        ([None], ["Japan"]),
+        ([], ["Sweden", "Japan"]),
+        (["DOS", "Game Boy"], ["Germany"]),
+        (["Atari 2600"], []),
+    ]:
+        dataset.set_filter(platforms, countries)
+        expected = scan_filter(dataset.base_dataset, platforms, countries)
+        assert dataset.filtered_dataset == expected
+        assert list(dataset.filtered_dataset) == list(expected)
+
+
+def test_set_gamelist_filter(company_datasets):
+    dataset = CombinedDataset(*company_datasets)
+    gamelist = ["game-1", "game-7", "game-unknown"]
+    dataset.set_gamelist_filter(gamelist)
+    for company_id, games in dataset.base_dataset.items():
+        expected = [game for game in games if game["game_slug"] in gamelist]
+        assert dataset.filtered_dataset.get(company_id, []) == expected
+
+
+def test_get_combined_dataset_snapshot(clean_cwd, company_datasets, monkeypatch):
+    datasets_dir = Path("lemongrab_datasets")
+    datasets_dir.mkdir()
+    filenames = [
+        "mobygames_companies.json",
+        "mobygames_companies_id_to_slug.json",
+        "wikidata_mapping.json",
+    ]
+    for filename, data in zip(filenames, company_datasets):
+        write_json(data, datasets_dir / filename)
+
+    dataset = get_combined_dataset()
+    assert (datasets_dir / "combined_dataset.snapshot").exists()
+
+    def no_datasets():
+        raise AssertionError("datasets should be loaded from the snapshot")
+
+    with monkeypatch.context() as m:
+        m.setattr(combined_dataset, "get_datasets", no_datasets)
+        snapshot = get_combined_dataset()
+    assert snapshot.base_dataset == dataset.base_dataset
+    assert snapshot.platforms == dataset.platforms
+    assert snapshot.country_index == dataset.country_index
+
+    # a changed dataset file invalidates the snapshot
+    wikidata_mapping = company_datasets[2] + [
+        {"mobygames_slug": "new-company", "country": "Germany"}
+    ]
+    write_json(wikidata_mapping, datasets_dir / "wikidata_mapping.json")
+    assert get_combined_dataset().country_map["new-company"] == "Germany"
+
+
+def test_filter_is_side_effect_free(company_datasets):
+    dataset = CombinedDataset(*company_datasets)
+    dataset.set_filter(["DOS"], [])
+    dos_overview = dataset.get_overview()
+
+    filtered = dataset.filter(["Game Boy"], ["Japan"])
+    gamelist_filtered = dataset.gamelist_filter(["game-1", "game-7"])
+
+    assert filtered == scan_filter(company_datasets[0], ["Game Boy"], ["Japan"])
+    assert set(gamelist_filtered) <= set(dataset.base_dataset)
+    assert dataset.get_overview() == dos_overview
+    assert dataset.get_overview(dataset.filter(["DOS"], [])) == dos_overview
@@ -0,0 +1,254 @@
+import importlib
+import json
+import pytest
+import sys
+import types
+
+from pathlib import Path
+
+# game id -> (company id, role) tuples of the game entry, game 3 has no companies
+GAMES = {
+    1: [(10, "Developed by"), (11, "Published by")],
+    2: [(10, "Developed by")],
+    3: [],
+    4: [(11, "Ported by"), (12, "Developed by")],
+}
+
+
+def entry(game_id, companies):
+    return {
+        "title": f"Game {game_id}",
+        "years": [1995],
+        "raw": {
+            "moby_url": f"https://www.mobygames.com/game/game-{game_id}",
+            "platforms": [
+                {
+                    "platform_name": "DOS",
+                    "releases": [
+                        {
+                            "countries": ["Japan"],
+                            "companies": [
+                                {
+                                    "company_id": company_id,
+                                    "company_name": f"Company {company_id}",
+                                    "role": role,
+                                }
+                                for company_id, role in companies
+                            ],
+                        }
+                    ],
+                }
+            ],
+        },
+    }
+
+
+class PlatformMapper:
+    def __init__(self, dataset):
+        pass
+
+    def __getitem__(self, platform_name):
+        return platform_name
+
+
+class Provenance:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class UnifiedApi:
+    """
+    Stand-in for the UnifiedAPI: lists :ids: and records the fetched entries. With
+    :fail_after: the fetching is interrupted after that many entries.
+    """
+
+    def __init__(self, ids, fail_after=None):
+        self.ids = ids
+        self.fail_after = fail_after
+        self.fetched = []
+
+    def mobygames_ids(self):
+        return list(self.ids)
+
+    def fetch_entries(self, base_url, dataset, ids, workers=1, cache=None):
+        for id_ in ids:
+            if self.fail_after is not None and len(self.fetched) >= self.fail_after:
+                raise KeyboardInterrupt
+            self.fetched.append(id_)
+            yield id_, entry(id_, GAMES[id_])
+
+
+@pytest.fixture()
+def company_dataset(clean_cwd, monkeypatch):
+    """
+    The company_dataset module with diggrtoolbox, the UnifiedAPI and the
+    provenance files stubbed out.
+    """
+    diggrtoolbox = types.ModuleType("diggrtoolbox")
+    diggrtoolbox.PlatformMapper = PlatformMapper
+    monkeypatch.setitem(sys.modules, "diggrtoolbox", diggrtoolbox)
+    monkeypatch.delitem(sys.modules, "lemongrab.company_dataset", raising=False)
+    module = importlib.import_module("lemongrab.company_dataset")
+    monkeypatch.setattr(module, "Provenance", Provenance)
+    Path("lemongrab_datasets").mkdir()
+    yield module
+    sys.modules.pop("lemongrab.company_dataset", None)
+
+
+def build(company_dataset, monkeypatch, api, **kwargs):
+    monkeypatch.setattr(company_dataset, "DiggrApi", lambda *args: api)
+    monkeypatch.setattr(company_dataset, "fetch_entries", api.fetch_entries)
+    return company_dataset.build_mobygames_companies(**kwargs)
+
+
+def read_dataset(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def expected_dataset(ids):
+    dataset = {}
+    for game_id in ids:
+        for company_id, role in GAMES[game_id]:
+            dataset.setdefault(str(company_id), []).append(
+                {
+                    "company_name": f"Company {company_id}",
+                    "game_id": game_id,
+                    "game_slug": f"game-{game_id}",
+                    "game_title": f"Game {game_id}",
+                    "game_years": [1995],
+                    "production_role": role,
+                    "release_countries": ["Japan"],
+                    "platform": "DOS",
+                }
+            )
+    return dataset
+
+
+def test_build(company_dataset, monkeypatch):
+    api = UnifiedApi([1, 2, 3, 4])
+    filename = build(company_dataset, monkeypatch, api)
+
+    assert read_dataset(filename) == expected_dataset([1, 2, 3, 4])
+    assert not Path("lemongrab_datasets/mobygames_companies.journal").exists()
+
+
+def test_resume_interrupted_build(company_dataset, monkeypatch):
+    with pytest.raises(KeyboardInterrupt):
+        build(company_dataset, monkeypatch, UnifiedApi([1, 2, 3, 4], fail_after=2))
+
+    api = UnifiedApi([1, 2, 3, 4])
+    filename = build(company_dataset, monkeypatch, api)
+
+    assert api.fetched == [3, 4]
+    assert read_dataset(filename) == expected_dataset([1, 2, 3, 4])
+
+
+def test_journal_cuts_truncated_line(company_dataset):
+    journal_file = Path("lemongrab_datasets/mobygames_companies.journal")
+    journal = company_dataset.BuildJournal(journal_file)
+    with journal:
+        journal.append(1, [["10", {"game_id": 1}]])
+        journal.append(2, [])
+    complete_size = journal_file.stat().st_size
+    with open(journal_file, "a") as f:
+        f.write('{"game_id": 3, "compan')
+
+    assert list(journal.entries()) == [(1, [["10", {"game_id": 1}]]), (2, [])]
+    assert journal_file.stat().st_size == complete_size
+
+
+def test_resume_after_truncated_journal(company_dataset, monkeypatch):
+    with pytest.raises(KeyboardInterrupt):
+        build(company_dataset, monkeypatch, UnifiedApi([1, 2, 3, 4], fail_after=2))
+    with open("lemongrab_datasets/mobygames_companies.journal", "a") as f:
+        f.write('{"game_id": 3, "compan')
+
+    api = UnifiedApi([1, 2, 3, 4])
+    filename = build(company_dataset, monkeypatch, api)
+
+    assert api.fetched == [3, 4]
+    assert read_dataset(filename) == expected_dataset([1, 2, 3, 4])
+
+
+def test_journal_seed(company_dataset):
+    journal = company_dataset.BuildJournal("lemongrab_datasets/journal")
+    games = [(1, [["10", {}]]), (2, [["10", {}]])]
+    journal.seed(games, [2, 3])
+
+    assert list(journal.entries()) == [(2, [["10", {}]])]
+
+
+def test_refresh_changed(company_dataset, monkeypatch):
+    build(company_dataset, monkeypatch, UnifiedApi([1, 2, 3]))
+
+    api = UnifiedApi([2, 3, 4])
+    filename = build(company_dataset, monkeypatch, api, refresh_changed=True)
+
+    assert api.fetched == [4]
+    assert read_dataset(filename) == expected_dataset([2, 3, 4])
+    assert read_dataset("lemongrab_datasets/mobygames_companies_processed.json") == [
+        2,
+        3,
+        4,
+    ]
+
+
+def test_journal_seed_processed_ids(company_dataset):
+    journal = company_dataset.BuildJournal("lemongrab_datasets/journal")
+    games = [(1, [["10", {}]])]
+    journal.seed(games, [1, 3, 4], processed_ids=[1, 2, 3])
+
+    assert list(journal.entries()) == [(1, [["10", {}]]), (3, [])]
+
+
+def test_jsonl_build(company_dataset, monkeypatch):
+    from lemongrab.utils import read_mobygames_companies
+
+    filename = build(
+        company_dataset, monkeypatch, UnifiedApi([1, 2, 3, 4]), output_format="jsonl"
+    )
+
+    assert filename.suffix == ".jsonl"
+    assert read_mobygames_companies(filename) == expected_dataset([1, 2, 3, 4])
+
+
+def test_jsonl_build_matches_id_2_slug(company_dataset, monkeypatch):
+    from lemongrab.combined_dataset import CombinedDataset
+    from lemongrab.utils import read_mobygames_records
+
+    filename = build(
+        company_dataset, monkeypatch, UnifiedApi([1, 2, 4]), output_format="jsonl"
+    )
+    id_2_slug = [{"company_id": str(i), "slug": f"c-{i}"} for i in (10, 11, 12)]
+    wikidata_mapping = [{"mobygames_slug": "c-11", "country": "Japan"}]
+    dataset = CombinedDataset(
+        read_mobygames_records(filename), id_2_slug, wikidata_mapping
+    )
+
+    assert list(dataset.base_dataset) == ["10", "11", "12"]
+    assert all(company_id in dataset.slug_map for company_id in dataset.base_dataset)
+    assert dataset.company_countries["11"] == "Japan"
+
+
+def test_refresh_changed_columnar(company_dataset, monkeypatch):
+    from lemongrab.columnar import ColumnarDataset
+    from lemongrab.utils import read_mobygames_companies
+
+    filename = build(company_dataset, monkeypatch, UnifiedApi([1, 2, 3]))
+    columnar_filename = filename.with_suffix(".columnar")
+    ColumnarDataset.from_mobygames_companies(read_mobygames_companies(filename)).save(
+        columnar_filename
+    )
+    filename.unlink()
+
+    assert dict(company_dataset.dataset_games(columnar_filename)).keys() == {1, 2}
+
+    api = UnifiedApi([2, 3, 4])
+    filename = build(company_dataset, monkeypatch, api, refresh_changed=True)
+
+    assert api.fetched == [4]
+    assert read_dataset(filename) == expected_dataset([2, 3, 4])
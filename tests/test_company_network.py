@@ -0,0 +1,278 @@
+import pytest
+import yaml
+
+from conftest import random_dataset
+from itertools import combinations
+from lemongrab.combined_dataset import CombinedDataset
+from lemongrab.company_network import CompanyNetworkBuilder, read_network_logs
+
+
+def pairwise_edges(builder):
+    """
+    Reference implementation comparing the games of every pair of nodes.
+    """
+    games = {}
+    for company_id, production_roles in builder.dataset.filtered_dataset.items():
+        for node in builder.company_ids(company_id, production_roles):
+            role = node.split("__")[1] if builder.roles else None
+            games[node] = builder._filter_games(
+                production_roles, builder.countries, builder.platform, role
+            )
+
+    edges = {}
+    for c1, c2 in combinations(games, 2):
+        overlap = games[c1] & games[c2]
+        if overlap:
+            edges[c1, c2] = len(overlap)
+    return games, edges
+
+
+@pytest.mark.parametrize(
+    "countries,platform,roles,publisher",
+    [
+        ((), "DOS", False, False),
+        (("Japan",), "DOS", False, False),
+        (("Japan", "Sweden"), "Game Boy", True, False),
+        ((), "Sony PlayStation", True, True),
+        ((), None, False, False),
+    ],
+)
+def test_build_graph_matches_pairwise(
+    company_datasets, countries, platform, roles, publisher
+):
+    builder = CompanyNetworkBuilder(
+        countries=countries,
+        platform=platform,
+        roles=roles,
+        publisher=publisher,
+        dataset=CombinedDataset(*company_datasets),
+    )
+    g, all_games = builder.build_graph()
+    games, edges = pairwise_edges(builder)
+
+    assert list(g.nodes) == list(games)
+    assert list(g.edges) == list(edges)
+    assert {e: g.edges[e]["weight"] for e in g.edges} == edges
+    assert all(g.nodes[n]["no_of_games"] == len(games[n]) for n in g.nodes)
+    assert all_games == {game for c1, c2 in edges for game in games[c1] & games[c2]}
+
+
+def test_build_graph_with_jobs(company_datasets):
+    graphs = []
+    for jobs in (1, 3):
+        builder = CompanyNetworkBuilder(
+            countries=(),
+            platform="DOS",
+            dataset=CombinedDataset(*company_datasets),
+            jobs=jobs,
+        )
+        graphs.append(builder.build_graph())
+
+    (g1, games1), (g3, games3) = graphs
+    assert games1 == games3
+    assert list(g1.nodes(data=True)) == list(g3.nodes(data=True))
+    assert list(g1.edges(data=True)) == list(g3.edges(data=True))
+
+
+def test_build_graph_profile(company_datasets):
+    builder = CompanyNetworkBuilder(
+        countries=(), platform="DOS", dataset=CombinedDataset(*company_datasets)
+    )
+    builder.build_graph()
+    assert builder.profiler.log() == {}
+
+    builder = CompanyNetworkBuilder(
+        countries=(),
+        platform="DOS",
+        dataset=CombinedDataset(*company_datasets),
+        profile=True,
+    )
+    builder.build_graph()
+    log = builder.profiler.log()
+    assert list(builder.profiler.stages) == ["filter", "projection", "annotation"]
+    assert log["profile_filter_seconds"] >= 0
+    assert log["profile_annotation_peak_rss_mb"] > 0
+
+
+def test_build_network_tables(company_datasets):
+    builder = CompanyNetworkBuilder(
+        countries=(),
+        platform="DOS",
+        roles=True,
+        dataset=CombinedDataset(*company_datasets),
+    )
+    network, all_games = builder.build_network()
+    g, _ = builder.build_graph()
+
+    assert network.number_of_nodes() == len(g.nodes)
+    assert network.number_of_edges() == len(g.edges)
+    assert dict(network.nodes()) == dict(g.nodes(data=True))
+    for source, target, weight in network.edges():
+        assert g.edges[source, target]["weight"] == weight
+
+
+def refreshed_datasets(reverse=False):
+    """
+    The company datasets after a refresh: one company worked on other games, one
+    company is gone and one company is new. With :reverse: the order of the
+    companies is reversed.
+    """
+    mobygames_companies, id_2_slug, wikidata_mapping = random_dataset()
+    refreshed, _, _ = random_dataset(n_companies=42, seed=2)
+    mobygames_companies["3"] = refreshed["3"]
+    del mobygames_companies["5"]
+    mobygames_companies["40"] = refreshed["40"]
+    id_2_slug.append({"company_id": "40", "slug": "c-40"})
+    if reverse:
+        mobygames_companies = dict(reversed(mobygames_companies.items()))
+    return mobygames_companies, id_2_slug, wikidata_mapping
+
+
+@pytest.mark.parametrize("roles", [False, True])
+@pytest.mark.parametrize("reverse", [False, True])
+def test_incremental_build_matches_full_build(
+    tmp_path, company_datasets, roles, reverse
+):
+    state_file = tmp_path / "network.state"
+    builder = CompanyNetworkBuilder(
+        countries=(),
+        platform="DOS",
+        roles=roles,
+        dataset=CombinedDataset(*company_datasets),
+        incremental=True,
+    )
+    network, _ = builder.build_network()
+    builder.write_state(state_file)
+
+    builder = CompanyNetworkBuilder(
+        countries=(),
+        platform="DOS",
+        roles=roles,
+        dataset=CombinedDataset(*refreshed_datasets(reverse)),
+        incremental=True,
+    )
+    previous = builder.read_state(state_file)
+    network, all_games = builder.build_network(previous=previous)
+
+    full_builder = CompanyNetworkBuilder(
+        countries=(),
+        platform="DOS",
+        roles=roles,
+        dataset=CombinedDataset(*refreshed_datasets(reverse)),
+    )
+    full_network, full_games = full_builder.build_network()
+
+    assert 0 < builder.changed_nodes < network.number_of_nodes()
+    assert all_games == full_games
+    assert list(network.nodes()) == list(full_network.nodes())
+    assert list(network.edges()) == list(full_network.edges())
+
+
+def test_read_state_checks_parameters(tmp_path, company_datasets):
+    state_file = tmp_path / "network.state"
+    builder = CompanyNetworkBuilder(
+        countries=(),
+        platform="DOS",
+        dataset=CombinedDataset(*company_datasets),
+        incremental=True,
+    )
+    network, _ = builder.build_network()
+    builder.write_state(state_file)
+
+    assert builder.read_state(state_file)["names"] == network.names
+    assert builder.read_state(tmp_path / "missing.state") is None
+    other_builder = CompanyNetworkBuilder(
+        countries=(), platform="Game Boy", incremental=True
+    )
+    assert other_builder.read_state(state_file) is None
+
+
+def test_read_network_logs(tmp_path):
+    with open(tmp_path / "company_network_Japan_DOS.graphml_log.yaml", "w") as f:
+        yaml.dump(
+            {"countries": ["Japan"], "platform": "DOS", "roles": True, "nodes": 3}, f
+        )
+    with open(tmp_path / "sample.graphml_log.yaml", "w") as f:
+        yaml.dump({"sample_games": 3, "nodes": 3}, f)
+
+    assert read_network_logs(tmp_path) == [
+        {
+            "gamelist": None,
+            "countries": ("Japan",),
+            "platform": "DOS",
+            "roles": True,
+            "publisher": False,
+            "format": "graphml",
+            "compress": False,
+            "min_weight": 1,
+            "top_companies": None,
+            "backbone": None,
+        }
+    ]
+
+
+def test_prune_network(company_datasets):
+    full_builder = CompanyNetworkBuilder(
+        countries=(), platform="DOS", dataset=CombinedDataset(*company_datasets)
+    )
+    full_network, _ = full_builder.build_network()
+    builder = CompanyNetworkBuilder(
+        countries=(),
+        platform="DOS",
+        dataset=CombinedDataset(*company_datasets),
+        min_weight=2,
+    )
+    network, _ = builder.build_network()
+
+    assert network.names == full_network.names
+    assert list(network.edges()) == [e for e in full_network.edges() if e[2] >= 2]
+    assert builder.out_filename() == "company_network__DOS_min2"
+
+
+def test_top_companies(company_datasets):
+    builder = CompanyNetworkBuilder(
+        countries=(),
+        platform="DOS",
+        roles=True,
+        dataset=CombinedDataset(*company_datasets),
+        top_companies=5,
+    )
+    network, _ = builder.build_network()
+    games, edges = pairwise_edges(builder)
+
+    companies = {name.split("__")[0] for name in network.names}
+    n_games = {
+        c: len(set().union(*(g for n, g in games.items() if n.startswith(f"{c}__"))))
+        for c in companies
+    }
+    assert len(companies) == 5
+    assert min(n_games.values()) >= max(
+        len(g) for n, g in games.items() if n.split("__")[0] not in companies
+    )
+    assert list(network.edges()) == [
+        (c1, c2, w)
+        for (c1, c2), w in edges.items()
+        if c1 in network.names and c2 in network.names
+    ]
+
+
+def test_incremental_build_with_backbone(tmp_path, company_datasets):
+    state_file = tmp_path / "network.state"
+    parameters = {"countries": (), "platform": "DOS", "backbone": 0.5}
+    builder = CompanyNetworkBuilder(
+        dataset=CombinedDataset(*company_datasets), incremental=True, **parameters
+    )
+    builder.build_network()
+    builder.write_state(state_file)
+
+    builder = CompanyNetworkBuilder(
+        dataset=CombinedDataset(*refreshed_datasets()), incremental=True, **parameters
+    )
+    network, _ = builder.build_network(previous=builder.read_state(state_file))
+    full_builder = CompanyNetworkBuilder(
+        dataset=CombinedDataset(*refreshed_datasets()), **parameters
+    )
+    full_network, _ = full_builder.build_network()
+
+    assert 0 < network.number_of_edges() < len(builder.state["weights"])
+    assert list(network.edges()) == list(full_network.edges())
@@ -0,0 +1,114 @@
+import json
+import pytest
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler
+from lemongrab.diggr_api import DiggrApi, fetch_entries
+from urllib.parse import parse_qs, urlparse
+
+
+class UnifiedApiHandler(BaseHTTPRequestHandler):
+    """
+    Local UnifiedAPI stand-in. Multi-id requests are only answered if the server
+    supports them, otherwise the id list is returned like by older versions.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append(self.path)
+        ids = parse_qs(url.query).get("ids")
+        if url.path == "/mobygames" and ids and self.server.bulk:
+            entries = {id_: {"id": id_} for id_ in ids[0].split(",") if id_ != "404"}
+            data = {"entries": entries}
+        elif url.path == "/mobygames":
+            data = {"ids": ["1", "2"]}
+        else:
+            data = {"entry": {"id": url.path.split("/")[-1]}}
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(params=[True, False], ids=["bulk", "single"])
+def unified_api(http_server, request):
+    server = http_server(UnifiedApiHandler)
+    server.bulk = request.param
+    return server
+
+
+def test_fetch_entries_keeps_id_order(monkeypatch):
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def entry(self, dataset, id_):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(random.random() / 100)
+        with lock:
+            in_flight[0] -= 1
+        return {"id": id_}
+
+    monkeypatch.setattr(DiggrApi, "entry", entry)
+    monkeypatch.setattr(DiggrApi, "_bulk_entries", lambda self, dataset, ids: None)
+
+    ids = [str(i) for i in range(50)]
+    result = list(fetch_entries("http://unified.api", "mobygames", ids, workers=4))
+
+    assert [id_ for id_, _ in result] == ids
+    assert all(data["id"] == id_ for id_, data in result)
+    assert in_flight[1] <= 4
+
+
+def test_entries(unified_api):
+    api = DiggrApi(
+        f"http://127.0.0.1:{unified_api.server_port}", bulk=True, bulk_size=3
+    )
+    ids = [str(i) for i in range(10)] + ["404"]
+
+    result = list(api.entries("mobygames", ids, workers=2))
+
+    assert [id_ for id_, _ in result] == ids
+    assert all(data["id"] == id_ for id_, data in result[:-1])
+    assert api.bulk_support["mobygames"] is unified_api.bulk
+    if unified_api.bulk:
+        # the single id request and chunks of 3 for the remaining 10 ids
+        assert len(unified_api.requests) == 1 + 4
+        assert result[-1] == ("404", None)
+    else:
+        # one multi-id request to detect the missing support
+        assert len(unified_api.requests) == 1 + len(ids)
+
+    # the support is remembered, the next ids are requested without detection
+    unified_api.requests.clear()
+    result = list(api.entries("mobygames", ids[:6], workers=2))
+
+    assert [id_ for id_, _ in result] == ids[:6]
+    assert len(unified_api.requests) == (2 if unified_api.bulk else 6)
+
+
+def test_entries_without_bulk(unified_api):
+    api = DiggrApi(f"http://127.0.0.1:{unified_api.server_port}")
+    ids = [str(i) for i in range(5)]
+
+    result = list(api.entries("mobygames", ids, workers=2))
+
+    assert [data["id"] for _, data in result] == ids
+    assert all("?ids=" not in path for path in unified_api.requests)
+    assert "mobygames" not in api.bulk_support
+
+
+def test_session_settings():
+    api = DiggrApi("http://unified.api", pool_size=32, keep_alive=False, gzip=False)
+
+    assert api.session.get_adapter("http://unified.api")._pool_maxsize == 32
+    assert api.session.headers["Connection"] == "close"
+    assert api.session.headers["Accept-Encoding"] == "identity"
@@ -0,0 +1,89 @@
+import csv
+import gzip
+import networkx as nx
+import pytest
+
+from lemongrab.export import (
+    check_format,
+    export_basename,
+    export_network,
+    network_edges,
+)
+
+
+@pytest.fixture()
+def graph():
+    g = nx.Graph()
+    g.add_node("1__Developed by", label="A & B (Developed by)", no_of_games=3)
+    g.add_node("2", label='"C"', no_of_games=1, country="Japan")
+    g.add_node("3", label="D", no_of_games=2)
+    g.add_edge("1__Developed by", "2", weight=2)
+    g.add_edge("2", "3", weight=1)
+    return g
+
+
+def assert_same_graph(g, expected):
+    assert dict(g.nodes(data=True)) == dict(expected.nodes(data=True))
+    assert {frozenset(e): g.edges[e]["weight"] for e in g.edges} == {
+        frozenset(e): expected.edges[e]["weight"] for e in expected.edges
+    }
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_export_graphml(tmp_path, graph, compress):
+    files = export_network(
+        graph.nodes(data=True),
+        network_edges(graph),
+        tmp_path / "net",
+        "graphml",
+        compress,
+    )
+    assert files == [tmp_path / ("net.graphml.gz" if compress else "net.graphml")]
+    assert_same_graph(nx.read_graphml(files[0]), graph)
+
+
+def test_export_gexf(tmp_path, graph):
+    files = export_network(
+        graph.nodes(data=True), network_edges(graph), tmp_path / "net", "gexf"
+    )
+    g = nx.read_gexf(files[0])
+    assert_same_graph(g, graph)
+
+
+def test_export_csv(tmp_path, graph):
+    nodes_file, edges_file = export_network(
+        graph.nodes(data=True), network_edges(graph), tmp_path / "net", "csv", True
+    )
+    with gzip.open(nodes_file, "rt") as f:
+        nodes = list(csv.DictReader(f))
+    with gzip.open(edges_file, "rt") as f:
+        edges = list(csv.DictReader(f))
+
+    assert nodes[1] == {
+        "Id": "2",
+        "Label": '"C"',
+        "no_of_games": "1",
+        "country": "Japan",
+    }
+    assert edges[0] == {
+        "Source": "1__Developed by",
+        "Target": "2",
+        "Type": "Undirected",
+        "Weight": "2",
+    }
+
+
+def test_check_format():
+    with pytest.raises(RuntimeError):
+        check_format("pajek")
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        with pytest.raises(RuntimeError, match="pip install pyarrow"):
+            check_format("parquet")
+
+
+def test_export_basename():
+    assert export_basename("out/network.graphml").as_posix() == "out/network"
+    assert export_basename("out/network.gexf.gz").as_posix() == "out/network"
+    assert export_basename("out/network.v2").as_posix() == "out/network.v2"
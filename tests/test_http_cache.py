@@ -0,0 +1,102 @@
+import json
+import pytest
+
+from http.server import BaseHTTPRequestHandler
+from lemongrab.diggr_api import DiggrApi
+from lemongrab.http_cache import ResponseCache
+
+ETAG = '"v1"'
+
+
+class EntryHandler(BaseHTTPRequestHandler):
+    """
+    Local UnifiedAPI stand-in answering conditional requests with 304.
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps({"entry": {"path": self.path}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def unified_api(http_server):
+    return http_server(EntryHandler)
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttl=60, max_size=2**20)
+    yield cache
+    cache.close()
+
+
+def test_put_and_get(cache):
+    assert cache.get("http://a") is None
+
+    cache.put("http://a", b'{"a": 1}', etag='"e"', last_modified="yesterday")
+    cached = cache.get("http://a")
+
+    assert cached.body == b'{"a": 1}'
+    assert cached.etag == '"e"'
+    assert cached.last_modified == "yesterday"
+    assert cache.is_fresh(cached)
+    assert not cache.is_fresh(cached, ttl=0)
+
+
+def test_cache_is_persistent(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttl=60, max_size=2**20)
+    cache.put("http://a", b"1")
+    cache.close()
+
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttl=60, max_size=2**20)
+    assert cache.get("http://a").body == b"1"
+    cache.close()
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttl=60, max_size=20)
+    for url in ["http://a", "http://b", "http://c"]:
+        cache.put(url, b"x" * 10)
+    cache.get("http://a")
+
+    cache.evict()
+
+    assert cache.get("http://a") is not None
+    assert cache.get("http://b") is None
+    assert cache.get("http://c") is not None
+    cache.close()
+
+
+def test_cached_call_uses_fresh_responses(cache, unified_api):
+    api = DiggrApi(f"http://127.0.0.1:{unified_api.server_port}", cache)
+
+    first = api.entry("mobygames", "1")
+    second = api.entry("mobygames", "1")
+
+    assert first == second == {"path": "/mobygames/1"}
+    assert unified_api.requests == [None]
+
+
+def test_cached_call_revalidates_stale_responses(tmp_path, unified_api):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttl=0, max_size=2**20)
+    api = DiggrApi(f"http://127.0.0.1:{unified_api.server_port}", cache)
+
+    first = api.entry("mobygames", "1")
+    second = api.entry("mobygames", "1")
+
+    assert first == second == {"path": "/mobygames/1"}
+    assert unified_api.requests == [None, ETAG]
+    cache.close()
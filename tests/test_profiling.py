@@ -0,0 +1,32 @@
+import pytest
+
+from lemongrab import profiling
+from lemongrab.profiling import StageProfiler
+
+
+@pytest.mark.skipif(
+    not profiling.reset_peak_rss(), reason="requires a resettable RSS peak (Linux)"
+)
+def test_stage_peak_is_reset():
+    profiler = StageProfiler()
+    with profiler.stage("allocate"):
+        data = bytearray(200 * 2**20)
+        data[:: 2**12] = b"x" * len(data[:: 2**12])
+        del data
+    with profiler.stage("small"):
+        sum(range(1000))
+
+    log = profiler.log()
+    assert log["profile_allocate_peak_rss_mb"] >= 200
+    assert log["profile_small_peak_rss_mb"] < log["profile_allocate_peak_rss_mb"] - 150
+
+
+def test_stage_peak_fallback(monkeypatch):
+    monkeypatch.setattr(profiling, "CLEAR_REFS", "/nonexistent/clear_refs")
+    profiler = StageProfiler()
+    with profiler.stage("small"):
+        sum(range(1000))
+
+    log = profiler.log()
+    assert "profile_small_peak_rss_mb" not in log
+    assert log["profile_small_rss_growth_mb"] >= 0
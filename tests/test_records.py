@@ -0,0 +1,37 @@
+from lemongrab.columnar import ColumnarDataset
+from lemongrab.records import columnar_records, compact_dataset
+
+
+def rows(mobygames_companies):
+    for company_id, infos in mobygames_companies.items():
+        for info in infos:
+            yield company_id, info
+
+
+def test_compact_dataset(company_datasets):
+    mobygames_companies = company_datasets[0]
+    records = compact_dataset(rows(mobygames_companies))
+    assert records == mobygames_companies
+    assert list(records) == list(mobygames_companies)
+
+    record = next(iter(records.values()))[0]
+    info = next(iter(mobygames_companies.values()))[0]
+    assert record.to_dict() == info
+    assert record["platform"] == info["platform"]
+
+
+def test_compact_dataset_shares_games(company_datasets):
+    records = compact_dataset(rows(company_datasets[0]))
+    games = {}
+    for company_records in records.values():
+        for record in company_records:
+            game = games.setdefault(record.game_id, record.release.game)
+            assert record.release.game is game
+
+
+def test_columnar_records(company_datasets):
+    mobygames_companies = company_datasets[0]
+    columnar = ColumnarDataset.from_mobygames_companies(mobygames_companies)
+    records = columnar_records(columnar)
+    assert records == mobygames_companies
+    assert records.vocabulary.platforms.values == columnar.platforms
@@ -0,0 +1,36 @@
+from lemongrab.combined_dataset import CombinedDataset
+from lemongrab.sample_company_network import SampleCompanyNetwork
+
+
+def sample_entry(company_id, game_slug, role="Developed by"):
+    return {
+        "company_id": company_id,
+        "company_name": f"Company {company_id}",
+        "role": role,
+        "release_countries": ["Japan"],
+        "platform": "DOS",
+        "game_slug": game_slug,
+    }
+
+
+def test_build_network(company_datasets):
+    sample = {
+        "game-a": [sample_entry(1, "game-a"), sample_entry(2, "game-a")],
+        "game-b": [
+            sample_entry(1, "game-b"),
+            sample_entry(2, "game-b", "Published by"),
+            sample_entry(3, "game-b"),
+        ],
+        "game-c": [sample_entry(4, "game-c")],
+    }
+    scn = SampleCompanyNetwork(sample, CombinedDataset(*company_datasets))
+    g = scn.build_network().graph
+
+    assert list(g.nodes) == [1, 2, 3, 4]
+    assert g.nodes[1]["country"] == "Japan"
+    assert g.nodes[2]["role"] == "Published by"
+    assert {e: g.edges[e]["weight"] for e in g.edges} == {
+        (1, 2): 2,
+        (1, 3): 1,
+        (2, 3): 1,
+    }
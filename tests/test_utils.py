@@ -0,0 +1,72 @@
+import csv
+import json
+import os
+import yaml
+
+from lemongrab.utils import (
+    build_aggregated_logs,
+    mobygames_companies_path,
+    read_mobygames_companies,
+    read_mobygames_records,
+)
+
+RECORD = {
+    "company_name": "Fox Interactive, Inc.",
+    "game_id": "672",
+    "game_slug": "die-hard-trilogy",
+    "game_title": "Die Hard Trilogy",
+    "game_years": [1996, 1997, 1998],
+    "production_role": "Published by",
+    "release_countries": ["Sweden", "United Kingdom", "Italy"],
+    "platform": "Sony PlayStation",
+}
+
+
+def test_read_mobygames_companies_jsonl(tmp_path):
+    dataset = {"1": [RECORD, dict(RECORD, game_id="673")], "2": [RECORD]}
+    json_file = tmp_path / "mobygames_companies.json"
+    json_file.write_text(json.dumps(dataset))
+    jsonl_file = tmp_path / "mobygames_companies.jsonl"
+    with open(jsonl_file, "w") as f:
+        for company_id, records in dataset.items():
+            for record in records:
+                f.write(json.dumps({"company_id": company_id, **record}) + "\n")
+
+    assert read_mobygames_companies(jsonl_file) == read_mobygames_companies(json_file)
+
+
+def test_mobygames_companies_path_prefers_newest(tmp_path):
+    assert mobygames_companies_path(tmp_path).name == "mobygames_companies.json"
+
+    (tmp_path / "mobygames_companies.json").write_text("{}")
+    (tmp_path / "mobygames_companies.jsonl").write_text("")
+    os.utime(tmp_path / "mobygames_companies.json", (0, 0))
+    assert mobygames_companies_path(tmp_path).name == "mobygames_companies.jsonl"
+
+
+def test_build_aggregated_logs(tmp_path):
+    logs = {
+        "a.graphml_log.yaml": {"countries": ["Japan", "Sweden"], "nodes": 3},
+        "b.graphml_log.yaml": {"nodes": 4, "profile_load_seconds": 0.5},
+    }
+    for filename, log in logs.items():
+        with open(tmp_path / filename, "w") as f:
+            yaml.dump(log, f)
+
+    outfilename = tmp_path / "logs.csv"
+    build_aggregated_logs(outfilename, tmp_path)
+    with open(outfilename) as f:
+        rows = sorted(csv.DictReader(f, delimiter=";"), key=lambda r: r["nodes"])
+
+    assert rows[0]["countries"] == "Japan, Sweden"
+    assert rows[0]["profile_load_seconds"] == ""
+    assert rows[1]["countries"] == ""
+    assert rows[1]["profile_load_seconds"] == "0.5"
+
+
+def test_read_mobygames_companies_jsonl_integer_ids(tmp_path):
+    jsonl_file = tmp_path / "mobygames_companies.jsonl"
+    jsonl_file.write_text(json.dumps({"company_id": 46, **RECORD}) + "\n")
+
+    assert list(read_mobygames_companies(jsonl_file)) == ["46"]
+    assert list(read_mobygames_records(jsonl_file)) == ["46"]
@@ -0,0 +1,98 @@
+import json
+import pytest
+import re
+
+from http.server import BaseHTTPRequestHandler
+from lemongrab.wikidata import (
+    apply_diff,
+    diff_mapping,
+    fetch_wikidata_mapping,
+    write_mapping,
+)
+from urllib.parse import parse_qs, urlparse
+
+BINDINGS = [
+    {
+        "companyId": {"type": "literal", "value": f"company-{i}"},
+        "item": {"type": "uri", "value": f"http://www.wikidata.org/entity/Q{i}"},
+        "countryLabel": {"type": "literal", "value": "Japan"},
+    }
+    for i in range(5)
+]
+
+
+class SparqlHandler(BaseHTTPRequestHandler):
+    """
+    Local SPARQL stand-in answering LIMIT/OFFSET queries with BINDINGS.
+    """
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)["query"][0]
+        self.server.requests.append(query)
+        limit = re.search(r"LIMIT (\d+)", query)
+        offset = re.search(r"OFFSET (\d+)", query)
+        bindings = BINDINGS
+        if limit:
+            start = int(offset.group(1))
+            end = start + int(limit.group(1))
+            bindings = BINDINGS[start:end]
+        body = json.dumps(
+            {
+                "head": {"vars": ["item", "itemLabel", "countryLabel", "companyId"]},
+                "results": {"bindings": bindings},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/sparql-results+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def sparql_endpoint(http_server):
+    return http_server(SparqlHandler)
+
+
+@pytest.mark.parametrize("page_size,n_queries", [(2, 3), (5, 2), (0, 1)])
+def test_fetch_wikidata_mapping(sparql_endpoint, page_size, n_queries):
+    endpoint = f"http://127.0.0.1:{sparql_endpoint.server_port}/sparql"
+    entries = [
+        entry for page in fetch_wikidata_mapping(endpoint, page_size) for entry in page
+    ]
+    assert len(sparql_endpoint.requests) == n_queries
+    assert entries[4] == {
+        "mobygames_slug": "company-4",
+        "country": "Japan",
+        "wkp": "Q4",
+    }
+    assert len(entries) == 5
+
+
+def test_write_mapping(tmp_path):
+    entries = [
+        {"mobygames_slug": "a", "country": "Japan", "wkp": "Q1"},
+        {"mobygames_slug": "b", "country": None, "wkp": "Q2"},
+    ]
+    mapping_filename = tmp_path / "wikidata_mapping.json"
+    assert write_mapping(iter(entries), mapping_filename) == 2
+    assert mapping_filename.read_text() == json.dumps(entries, indent=4)
+
+    write_mapping(iter([]), mapping_filename)
+    assert json.loads(mapping_filename.read_text()) == []
+
+
+def test_diff_mapping():
+    old = [
+        {"mobygames_slug": "a", "country": "Japan", "wkp": "Q1"},
+        {"mobygames_slug": "b", "country": None, "wkp": "Q2"},
+        {"mobygames_slug": "c", "country": "Sweden", "wkp": "Q3"},
+    ]
+    new = [old[2], dict(old[1], country="Germany"), old[0]]
+    added, removed = diff_mapping(old, new)
+    assert added == [new[1]]
+    assert removed == [old[1]]
+    assert apply_diff(old, added, removed) == [old[0], old[2], new[1]]